@@ -1,7 +1,7 @@
 import bcrypt
 from fastapi import APIRouter, Response, Request, HTTPException, Form
 from fastapi.responses import HTMLResponse
-from backend.database import get_connection
+from backend.database import get_connection, run_db
 from backend.models import LoginRequest
 
 router = APIRouter()
@@ -30,6 +30,18 @@ def get_current_user(request: Request) -> dict:
     return dict(user)
 
 
+def _authenticate(username: str, password: str):
+    """Restituisce la riga utente se le credenziali sono valide, altrimenti None."""
+    conn = get_connection()
+    user = conn.execute(
+        "SELECT * FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    conn.close()
+    if not user or not verify_password(password, user["password_hash"]):
+        return None
+    return user
+
+
 def create_default_users():
     """Crea gli utenti di default se non esistono."""
     conn = get_connection()
@@ -67,13 +79,9 @@ async def login(request: Request):
     if not username or not password:
         raise HTTPException(status_code=400, detail="Username e password obbligatori")
 
-    conn = get_connection()
-    user = conn.execute(
-        "SELECT * FROM users WHERE username = ?", (username,)
-    ).fetchone()
-    conn.close()
-
-    if not user or not verify_password(password, user["password_hash"]):
+    # Query e bcrypt sono bloccanti: eseguiti nell'executor DB
+    user = await run_db(_authenticate, username, password)
+    if not user:
         raise HTTPException(status_code=401, detail="Credenziali non valide")
 
     request.session["user_id"] = user["id"]
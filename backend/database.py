@@ -1,19 +1,117 @@
+import asyncio
+import functools
 import sqlite3
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = os.getenv("DB_PATH", str(BASE_DIR / "data" / "reminder.db"))
+CONFIG_PATH = BASE_DIR / "config.yaml"
 
+# Ogni quanto (secondi) get_telegram_config controlla l'mtime di config.yaml
+CONFIG_MTIME_CHECK_SEC = 5
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+
+# Pragma applicati una sola volta, alla creazione di ogni connessione del pool
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA synchronous=NORMAL",     # sicuro in WAL, evita un fsync per commit
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",      # ~16 MB di page cache per connessione
+    "PRAGMA mmap_size=268435456",    # 256 MB di I/O memory-mapped
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Ordine della lista per stato (GET /reminders, sort=status): colonna generata
+# reminders.status_rank, indicizzata per la paginazione keyset
+STATUS_RANK_SQL = (
+    "CASE status WHEN 'pending' THEN 1 WHEN 'sent' THEN 2 WHEN 'completed' THEN 3 "
+    "WHEN 'paused' THEN 4 WHEN 'resolved' THEN 5 WHEN 'deleted' THEN 6 ELSE 7 END"
+)
+
+# Connessioni inattive riutilizzabili (LIFO: il thread che rilascia riprende
+# di solito la stessa connessione, con la cache ancora calda)
+POOL_SIZE = 8
+_pool = []
+_pool_lock = threading.Lock()
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connessione del pool: close() la restituisce al pool invece di chiuderla."""
+
+    in_use = False
+
+    def close(self):
+        _release(self)
+
+
+def _open_connection() -> PooledConnection:
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, timeout=5, factory=PooledConnection
+    )
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+def get_connection() -> sqlite3.Connection:
+    """
+    Preleva una connessione dal pool condiviso (scheduler, web, bot).
+    Non blocca mai: se il pool è vuoto apre una nuova connessione, quindi è
+    utilizzabile anche dall'event loop del bot. Va rilasciata con close().
+    """
+    with _pool_lock:
+        conn = _pool.pop() if _pool else None
+    if conn is None:
+        conn = _open_connection()
+    conn.in_use = True
+    return conn
+
+
+def _release(conn: PooledConnection):
+    """Rimette la connessione nel pool annullando eventuali transazioni lasciate aperte."""
+    if not conn.in_use:
+        return
+    conn.in_use = False
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        sqlite3.Connection.close(conn)
+        return
+    with _pool_lock:
+        if len(_pool) < POOL_SIZE:
+            _pool.append(conn)
+            return
+    sqlite3.Connection.close(conn)
+
+
+# Executor dedicato all'accesso al DB dagli handler async (FastAPI, bot):
+# le query sqlite3 sono bloccanti e non devono girare sull'event loop.
+_db_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    """Esegue una funzione sincrona di accesso al DB nell'executor dedicato."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+
+def close_pool():
+    """Chiude tutte le connessioni inattive del pool (es. prima di un restore)."""
+    with _pool_lock:
+        idle = _pool[:]
+        _pool.clear()
+    for conn in idle:
+        sqlite3.Connection.close(conn)
+
+
 def init_db():
     conn = get_connection()
     cur = conn.cursor()
@@ -38,6 +136,7 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             deleted_at TIMESTAMP,
             last_sent_at TIMESTAMP,
+            next_execution_epoch INTEGER,
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
 
@@ -50,12 +149,70 @@ def init_db():
             FOREIGN KEY (reminder_id) REFERENCES reminders(id)
         );
 
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            execution_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+                CHECK(status IN ('pending','sent','failed','cancelled')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP,
+            FOREIGN KEY (execution_id) REFERENCES executions(id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+            ON outbox(next_attempt_at) WHERE status = 'pending';
+        CREATE INDEX IF NOT EXISTS idx_outbox_execution
+            ON outbox(execution_id);
+
+        -- Storico per reminder (conferma, solleciti) e solo executions aperte
+        -- per il job orario dei solleciti: resta piccolo a qualsiasi volume
+        CREATE INDEX IF NOT EXISTS idx_executions_reminder
+            ON executions(reminder_id, confirmed, sent_at);
+        CREATE INDEX IF NOT EXISTS idx_executions_unconfirmed
+            ON executions(reminder_id, sent_at) WHERE confirmed = 0;
+
+        -- Aggregato delle executions eliminate dalla retention (scheduler/retention.py)
+        CREATE TABLE IF NOT EXISTS execution_summary (
+            reminder_id INTEGER PRIMARY KEY,
+            sent_count INTEGER NOT NULL DEFAULT 0,
+            confirmed_count INTEGER NOT NULL DEFAULT 0,
+            first_sent_at TIMESTAMP,
+            last_sent_at TIMESTAMP,
+            last_confirmed_at TIMESTAMP,
+            FOREIGN KEY (reminder_id) REFERENCES reminders(id)
+        );
+
+        -- Occorrenze future materializzate per l'agenda (scheduler/occurrences.py)
+        CREATE TABLE IF NOT EXISTS occurrences (
+            reminder_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            occurs_epoch INTEGER NOT NULL,
+            PRIMARY KEY (reminder_id, occurs_epoch),
+            FOREIGN KEY (reminder_id) REFERENCES reminders(id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_occurrences_user
+            ON occurrences(user_id, occurs_epoch);
+        -- Reminder espansi solo in parte (limite occurrences_max_per_reminder):
+        -- le loro occorrenze sono complete fino a until_epoch (ultima materializzata)
+        CREATE TABLE IF NOT EXISTS occurrences_truncated (
+            reminder_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            until_epoch INTEGER NOT NULL,
+            FOREIGN KEY (reminder_id) REFERENCES reminders(id) ON DELETE CASCADE
+        );
+
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             type TEXT NOT NULL CHECK(type IN ('INFO','WARN','ERROR')),
             message TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+        CREATE INDEX IF NOT EXISTS idx_logs_created ON logs(created_at);
 
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
@@ -69,6 +226,9 @@ def init_db():
 
     # Migrazione automatica: assicura che 'resolved' sia nel CHECK constraint
     _migrate_status_constraint()
+    _migrate_next_execution_epoch()
+    _migrate_execution_timestamps()
+    _migrate_list_indexes()
 
 
 def _migrate_status_constraint():
@@ -102,6 +262,92 @@ def _migrate_status_constraint():
     conn.close()
 
 
+def _migrate_next_execution_epoch():
+    """
+    Aggiunge la colonna next_execution_epoch (UTC, secondi) e l'indice parziale
+    usato dalle query di scadenza dello scheduler. Riallinea anche le righe
+    scritte senza epoch (DB esistenti o versioni precedenti).
+    """
+    conn = get_connection()
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(reminders)")}
+    if "next_execution_epoch" not in columns:
+        conn.execute("ALTER TABLE reminders ADD COLUMN next_execution_epoch INTEGER")
+    # Tutti i writer salvano next_execution in UTC: i primi 19 caratteri bastano
+    conn.execute(
+        """UPDATE reminders
+           SET next_execution_epoch = CAST(strftime('%s', substr(next_execution,1,19)) AS INTEGER)
+           WHERE next_execution_epoch IS NULL"""
+    )
+    conn.execute(
+        """CREATE INDEX IF NOT EXISTS idx_reminders_due
+           ON reminders(status, next_execution_epoch)
+           WHERE deleted_at IS NULL"""
+    )
+    conn.commit()
+    conn.close()
+
+
+def _migrate_execution_timestamps():
+    """
+    Uniforma executions.sent_at al formato 'YYYY-MM-DDTHH:MM:SS' scritto dallo
+    scheduler (il default CURRENT_TIMESTAMP usa lo spazio): così il confronto
+    tra stringhe nelle query dei solleciti usa l'indice senza substr().
+    """
+    conn = get_connection()
+    conn.execute(
+        """UPDATE executions
+           SET sent_at = replace(substr(sent_at,1,19), ' ', 'T')
+           WHERE sent_at IS NOT NULL AND sent_at != replace(substr(sent_at,1,19), ' ', 'T')"""
+    )
+    conn.commit()
+    conn.close()
+
+
+def _migrate_list_indexes():
+    """
+    Aggiunge la colonna generata status_rank e un indice per ogni ordinamento
+    della lista reminder (paginazione keyset): user_id + chiave di ordinamento
+    + id, con status in coda così anche i filtri per stato si valutano
+    sull'indice senza leggere la riga.
+    """
+    conn = get_connection()
+    # table_xinfo: table_info non elenca le colonne generate
+    columns = {r["name"] for r in conn.execute("PRAGMA table_xinfo(reminders)")}
+    if "status_rank" not in columns:
+        conn.execute(
+            f"ALTER TABLE reminders ADD COLUMN status_rank INTEGER "
+            f"GENERATED ALWAYS AS ({STATUS_RANK_SQL}) VIRTUAL"
+        )
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_list_status
+            ON reminders(user_id, status_rank, next_execution_epoch, id, status);
+        CREATE INDEX IF NOT EXISTS idx_reminders_list_date
+            ON reminders(user_id, next_execution_epoch, id, status);
+        CREATE INDEX IF NOT EXISTS idx_reminders_list_id
+            ON reminders(user_id, id, status);
+    """)
+    conn.commit()
+    conn.close()
+
+
+def to_utc_str(value) -> str:
+    """Normalizza datetime/stringa ISO in 'YYYY-MM-DDTHH:MM:SS' UTC senza offset (naive = UTC)."""
+    dt = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def to_epoch(value) -> int:
+    """Converte datetime/stringa ISO (naive = UTC) in epoch UTC in secondi."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    dt = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
 def get_setting(key: str, default=None):
     """Legge un valore dalla tabella settings."""
     conn = get_connection()
@@ -111,7 +357,7 @@ def get_setting(key: str, default=None):
 
 
 def set_setting(key: str, value: str):
-    """Scrive/aggiorna un valore nella tabella settings."""
+    """Scrive/aggiorna un valore nella tabella settings e invalida la cache config."""
     conn = get_connection()
     conn.execute(
         """INSERT INTO settings (key, value, updated_at)
@@ -122,35 +368,63 @@ def set_setting(key: str, value: str):
     )
     conn.commit()
     conn.close()
+    invalidate_config_cache()
 
 
-def get_telegram_config() -> dict:
-    """
-    Restituisce la config Telegram attiva.
-    Priorità per ogni campo: DB (impostato dalla UI) → config.yaml → valore vuoto.
-    Token e chat_ids vengono letti indipendentemente l'uno dall'altro.
-    """
+# Cache della config Telegram: ricaricata solo quando la versione cambia
+# (set_setting / router settings) o quando config.yaml viene modificato.
+_config_lock = threading.Lock()
+_config_cache = {
+    "version": 0,          # incrementata a ogni invalidazione
+    "loaded_version": -1,  # versione a cui si riferisce "value"
+    "value": None,
+    "yaml_mtime": None,
+    "mtime_checked_at": 0.0,
+}
+
+
+def invalidate_config_cache():
+    """Forza la rilettura della config Telegram alla prossima get_telegram_config()."""
+    with _config_lock:
+        _config_cache["version"] += 1
+
+
+def _yaml_mtime():
+    try:
+        return CONFIG_PATH.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _load_telegram_config() -> dict:
+    """Legge la config Telegram da DB e config.yaml (senza cache)."""
     import json, yaml
-    from pathlib import Path
 
     # Leggi config.yaml come fallback
     yaml_token = ""
     yaml_chat_ids = []
-    config_path = Path(__file__).resolve().parent.parent / "config.yaml"
-    if config_path.exists():
+    if CONFIG_PATH.exists():
         try:
-            with open(config_path) as f:
+            with open(CONFIG_PATH) as f:
                 cfg = yaml.safe_load(f)
             yaml_token = cfg.get("telegram_token", "")
             yaml_chat_ids = cfg.get("chat_ids", [])
         except Exception:
             pass
 
+    # Token e chat IDs letti con una sola connessione
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT key, value FROM settings WHERE key IN ('telegram_token', 'telegram_chat_ids')"
+    ).fetchall()
+    conn.close()
+    db = {r["key"]: r["value"] for r in rows}
+
     # Token: DB ha priorità su config.yaml
-    token = get_setting("telegram_token") or yaml_token
+    token = db.get("telegram_token") or yaml_token
 
     # Chat IDs: DB ha priorità su config.yaml
-    chat_ids_raw = get_setting("telegram_chat_ids")
+    chat_ids_raw = db.get("telegram_chat_ids")
     if chat_ids_raw:
         try:
             chat_ids = json.loads(chat_ids_raw)
@@ -162,3 +436,29 @@ def get_telegram_config() -> dict:
     return {"telegram_token": token, "chat_ids": chat_ids}
 
 
+def get_telegram_config() -> dict:
+    """
+    Restituisce la config Telegram attiva.
+    Priorità per ogni campo: DB (impostato dalla UI) → config.yaml → valore vuoto.
+    Token e chat_ids vengono letti indipendentemente l'uno dall'altro.
+
+    Il risultato è in cache: DB e YAML vengono riletti solo dopo
+    invalidate_config_cache() o se l'mtime di config.yaml è cambiato
+    (controllato al massimo ogni CONFIG_MTIME_CHECK_SEC secondi).
+    """
+    with _config_lock:
+        now = time.monotonic()
+        if now - _config_cache["mtime_checked_at"] >= CONFIG_MTIME_CHECK_SEC:
+            _config_cache["mtime_checked_at"] = now
+            mtime = _yaml_mtime()
+            if mtime != _config_cache["yaml_mtime"]:
+                _config_cache["yaml_mtime"] = mtime
+                _config_cache["version"] += 1
+
+        if _config_cache["loaded_version"] != _config_cache["version"]:
+            _config_cache["value"] = _load_telegram_config()
+            _config_cache["loaded_version"] = _config_cache["version"]
+        value = _config_cache["value"]
+
+    # Copia difensiva: i chiamanti non devono poter alterare la cache
+    return {"telegram_token": value["telegram_token"], "chat_ids": list(value["chat_ids"])}
@@ -0,0 +1,114 @@
+"""
+Notifiche di modifica dei reminder verso la UI (Server-Sent Events).
+
+Router, conferme, bot e scheduler chiamano publish() dopo il commit, da
+qualsiasi thread; ogni pagina aperta ha una coda asyncio sul loop di uvicorn
+letta dall'endpoint GET /reminders/events. Gli eventi contengono solo gli ID
+dei reminder cambiati: la pagina richiede poi le singole righe.
+
+Ogni publish() incrementa anche la versione della lista dell'utente, usata
+come ETag da GET /reminders per rispondere 304 senza toccare DB e Jinja, e
+segna i reminder da riespandere nella tabella occurrences dell'agenda.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+
+from scheduler import occurrences
+
+# Oltre questo numero di eventi non letti la pagina riceve un reset
+# (ricarica la lista intera) invece di accumulare ID
+QUEUE_SIZE = 100
+
+_subscribers = {}
+_lock = threading.Lock()
+
+# Versioni per utente: monotone nel processo; BOOT_ID le distingue tra riavvii
+BOOT_ID = format(int(time.time()), "x")
+_versions = {}
+_version_counter = itertools.count(1)
+
+
+def get_version(user_id: int) -> int:
+    """Versione corrente della lista reminder dell'utente (0 = nessuna modifica dall'avvio)."""
+    return _versions.get(user_id, 0)
+
+
+def bump(user_id: int):
+    """Segna come cambiata la lista dell'utente (invalida l'ETag)."""
+    with _lock:
+        _versions[user_id] = next(_version_counter)
+
+
+class Subscriber:
+    """Coda di una singola connessione SSE (vive sul loop che l'ha creata)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def _push(self, reminder_ids: list):
+        try:
+            self.queue.put_nowait(reminder_ids)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)  # None = reset
+
+    async def next_event(self, timeout: float):
+        """
+        Attende il prossimo evento e accorpa quelli già in coda.
+        Restituisce {"ids": [...]} o {"reset": True}; None allo scadere del timeout.
+        """
+        first = await asyncio.wait_for(self.queue.get(), timeout)
+        batches = [first]
+        while not self.queue.empty():
+            batches.append(self.queue.get_nowait())
+        if any(b is None for b in batches):
+            return {"reset": True}
+        return {"ids": sorted({rid for batch in batches for rid in batch})}
+
+
+def subscribe(user_id: int) -> Subscriber:
+    """Registra una connessione SSE dell'utente (da chiamare sul loop di uvicorn)."""
+    sub = Subscriber(asyncio.get_running_loop())
+    with _lock:
+        _subscribers.setdefault(user_id, set()).add(sub)
+    return sub
+
+
+def unsubscribe(user_id: int, sub: Subscriber):
+    with _lock:
+        subs = _subscribers.get(user_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del _subscribers[user_id]
+
+
+def publish(user_id: int, reminder_ids):
+    """Notifica le pagine aperte dell'utente che i reminder indicati sono cambiati."""
+    reminder_ids = list(reminder_ids)
+    if not reminder_ids:
+        return
+    bump(user_id)
+    occurrences.mark_dirty(reminder_ids)
+    with _lock:
+        subs = list(_subscribers.get(user_id, ()))
+    for sub in subs:
+        try:
+            sub.loop.call_soon_threadsafe(sub._push, reminder_ids)
+        except RuntimeError:
+            # Loop già chiuso (shutdown): la connessione non esiste più
+            unsubscribe(user_id, sub)
+
+
+def publish_rows(rows):
+    """publish() per righe reminders (dict o sqlite3.Row con id e user_id), raggruppate per utente."""
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row["id"])
+    for user_id, reminder_ids in by_user.items():
+        publish(user_id, reminder_ids)
@@ -18,6 +18,9 @@ from backend.auth import router as auth_router, create_default_users
 from backend.routers.reminders import router as reminders_router
 from backend.routers.confirm import router as confirm_router
 from backend.routers.settings import router as settings_router
+from backend.routers.api import router as api_router
+from backend.routers.transfer import router as transfer_router
+from backend.routers.agenda import router as agenda_router
 
 # Carica config
 import yaml
@@ -40,6 +43,9 @@ app.include_router(auth_router)
 app.include_router(reminders_router)
 app.include_router(confirm_router)
 app.include_router(settings_router)
+app.include_router(api_router)
+app.include_router(transfer_router)
+app.include_router(agenda_router)
 
 
 @app.on_event("startup")
@@ -66,9 +72,17 @@ async def dashboard(request: Request):
     )
 
 
+@app.on_event("shutdown")
+def shutdown():
+    from scheduler.log_manager import flush_db_log
+    flush_db_log()
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    from scheduler.log_manager import get_db_log_stats
+    from scheduler.backup import get_backup_stats
+    return {"status": "ok", "db_log": get_db_log_stats(), "backup": get_backup_stats()}
 
 
 if __name__ == "__main__":
@@ -80,5 +94,6 @@ if __name__ == "__main__":
         reload=(env == "dev"),
         log_level="warning",   # evita il flood di GET /reminders ogni 30s
         access_log=False,      # disabilita access log (usa il logger applicativo)
+        timeout_graceful_shutdown=5,  # le connessioni SSE restano aperte: non attenderle all'infinito
     )
 
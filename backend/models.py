@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 import html
 
@@ -46,6 +46,11 @@ class ReminderUpdate(BaseModel):
         return v
 
 
+class ReminderBulkAction(BaseModel):
+    action: Literal["pause", "resume", "delete", "resolve"]
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
 class ReminderOut(BaseModel):
     id: int
     user_id: int
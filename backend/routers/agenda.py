@@ -0,0 +1,140 @@
+"""
+Agenda e previsione del carico di invio (/api/v1/agenda, /api/v1/forecast).
+
+Leggono la tabella occurrences materializzata da scheduler/occurrences.py
+(range scan su user_id + occurs_epoch, o aggregato per minuto) invece di
+espandere recurrence_json a ogni richiesta; prima della lettura applicano le
+modifiche ai reminder ancora in sospeso.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytz
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+
+from backend.auth import get_current_user
+from backend.database import get_connection, get_telegram_config, run_db, to_epoch
+from backend.routers.reminders import _localize_to_utc
+from scheduler import delivery_plan, occurrences
+
+router = APIRouter(prefix="/api/v1", tags=["agenda"], default_response_class=ORJSONResponse)
+
+AGENDA_DEFAULT_DAYS = 7
+
+
+def _fetch_agenda(user_id: int, start_epoch: int, end_epoch: int) -> tuple:
+    """
+    (righe occorrenza + reminder nell'intervallo [start, end), fine
+    materializzata, reminder troncati prima di `end` con l'ultima occorrenza
+    materializzata).
+    """
+    until = occurrences.ensure_fresh()
+    end_epoch = min(end_epoch, to_epoch(until))
+    conn = get_connection()
+    truncated = conn.execute(
+        """SELECT reminder_id, until_epoch FROM occurrences_truncated
+           WHERE user_id = ? AND until_epoch < ? ORDER BY until_epoch, reminder_id""",
+        (user_id, end_epoch),
+    ).fetchall()
+    rows = conn.execute(
+        """SELECT o.reminder_id, o.occurs_epoch, r.message, r.status, r.recurrence_json
+           FROM occurrences o JOIN reminders r ON r.id = o.reminder_id
+           WHERE o.user_id = ? AND o.occurs_epoch >= ? AND o.occurs_epoch < ?
+           ORDER BY o.occurs_epoch, o.reminder_id""",
+        (user_id, start_epoch, end_epoch),
+    ).fetchall()
+    conn.close()
+    return rows, until, truncated
+
+
+@router.get("/agenda")
+async def api_agenda(
+    start: str = None,
+    days: int = AGENDA_DEFAULT_DAYS,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Occorrenze da `start` (YYYY-MM-DD, giorno locale dell'utente; default oggi)
+    per `days` giorni. `until` < fine intervallo = agenda completa solo fino a
+    `until`: oltre l'orizzonte materializzato, o reminder ad alta frequenza
+    espansi fino al limite per reminder (elencati in `truncated` con l'ultima
+    occorrenza materializzata).
+    """
+    user_tz = current_user.get("timezone", "Europe/Rome")
+    try:
+        tz = pytz.timezone(user_tz)
+    except Exception:
+        tz = pytz.timezone("Europe/Rome")
+    if not 1 <= days <= occurrences.HORIZON_DAYS:
+        raise HTTPException(status_code=400, detail=f"days deve essere tra 1 e {occurrences.HORIZON_DAYS}")
+    try:
+        first_day = datetime.strptime(start, "%Y-%m-%d") if start else datetime.now(tz).replace(
+            hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start deve essere nel formato YYYY-MM-DD")
+
+    window_start = _localize_to_utc(first_day.isoformat(), user_tz)
+    window_end = _localize_to_utc((first_day + timedelta(days=days)).isoformat(), user_tz)
+    rows, until, truncated = await run_db(
+        _fetch_agenda, current_user["id"], to_epoch(window_start), to_epoch(window_end)
+    )
+
+    items = []
+    for row in rows:
+        at = datetime.fromtimestamp(row["occurs_epoch"], timezone.utc)
+        local = at.astimezone(tz)
+        items.append({
+            "reminder_id": row["reminder_id"],
+            "at": at,
+            "date": local.strftime("%Y-%m-%d"),
+            "time": local.strftime("%H:%M"),
+            "message": row["message"],
+            "status": row["status"],
+            "recurrence_json": row["recurrence_json"],
+        })
+    truncated = [
+        {"reminder_id": row["reminder_id"], "until": datetime.fromtimestamp(row["until_epoch"], timezone.utc)}
+        for row in truncated
+    ]
+    return ORJSONResponse({
+        "start": first_day.strftime("%Y-%m-%d"),
+        "days": days,
+        "until": min([window_end, until] + [entry["until"] for entry in truncated]),
+        "truncated": truncated,
+        "items": items,
+    })
+
+
+def _fetch_forecast(days: int, window: float) -> dict:
+    until = occurrences.ensure_fresh()
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    end = min(start + timedelta(days=days), until)
+    n_chats = len(get_telegram_config()["chat_ids"])
+    result = delivery_plan.forecast(to_epoch(start), to_epoch(end), n_chats, window)
+    result.update(start=start, until=end, chats=n_chats)
+    return result
+
+
+@router.get("/forecast")
+async def api_forecast(
+    days: int = AGENDA_DEFAULT_DAYS,
+    window: float = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Invii previsti per minuto nei prossimi `days` giorni (tutti gli utenti) e
+    ritardi stimati alla scadenza e con smussamento; `window` (secondi)
+    simula una finestra diversa da delivery_smoothing_window_sec.
+    """
+    if not 1 <= days <= occurrences.HORIZON_DAYS:
+        raise HTTPException(status_code=400, detail=f"days deve essere tra 1 e {occurrences.HORIZON_DAYS}")
+    if window is not None and window < 0:
+        raise HTTPException(status_code=400, detail="window deve essere >= 0")
+    result = await run_db(
+        _fetch_forecast, days, delivery_plan.SMOOTHING_WINDOW_SEC if window is None else window
+    )
+    for entry in result["minutes"] + result["peaks"]:
+        if isinstance(entry["minute"], int):
+            entry["minute"] = datetime.fromtimestamp(entry["minute"], timezone.utc)
+    return ORJSONResponse(result)
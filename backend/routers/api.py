@@ -0,0 +1,342 @@
+"""
+API JSON versionata dei reminder (/api/v1/reminders) per le integrazioni.
+
+Stessa logica e stessi effetti delle route HTML (due queue, eventi SSE, ETag
+della lista), ma ogni chiamata restituisce solo la risorsa interessata,
+serializzata con orjson, senza render di template. Le operazioni di massa
+(/bulk, /bulk/status) usano una sola transazione e rispondono per elemento.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+
+from backend import events
+from backend.auth import get_current_user
+from backend.database import get_connection, run_db, to_utc_str, to_epoch
+from backend.models import ReminderBulkAction, ReminderCreate, ReminderUpdate, ReminderOut
+from backend.routers.reminders import (
+    PAGE_SIZE, MAX_PAGE_SIZE, LIST_STATUSES,
+    _list_filters, _fetch_reminders, _get_user_reminder, _insert_reminder,
+    _update_reminder_fields, _soft_delete_reminder, _localize_to_utc, _row_to_dict,
+)
+from scheduler.due_queue import schedule_reminder, cancel_reminder, sync_reminder
+
+router = APIRouter(prefix="/api/v1/reminders", tags=["api"], default_response_class=ORJSONResponse)
+
+_OUT_FIELDS = tuple(ReminderOut.model_fields)
+
+BULK_MAX_ITEMS = 1000
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+_INVALID_LINE = object()
+
+# Azioni di massa: SET della UPDATE e stati di partenza ammessi
+BULK_ACTIONS = {
+    "pause": ("status = 'paused'", {"pending", "sent", "completed", "paused"}),
+    "resume": ("status = 'pending'", {"paused", "pending"}),
+    "delete": ("status = 'deleted', deleted_at = :now", set(LIST_STATUSES)),
+    "resolve": ("status = 'resolved', deleted_at = NULL", set(LIST_STATUSES)),
+}
+
+
+def _reminder_out(row) -> dict:
+    """Riga reminders → dict con i campi di ReminderOut (date UTC con offset)."""
+    d = row if isinstance(row, dict) else _row_to_dict(row)
+    out = {}
+    for field in _OUT_FIELDS:
+        value = d.get(field)
+        if isinstance(value, datetime) and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        out[field] = value
+    return out
+
+
+def _to_utc(value: datetime, user_tz: str) -> datetime:
+    """Date senza offset = ora locale dell'utente, come nel form HTML."""
+    if value.tzinfo is None:
+        return _localize_to_utc(value.isoformat(), user_tz)
+    return value.astimezone(timezone.utc)
+
+
+def _recurrence_error(recurrence_json):
+    if recurrence_json:
+        try:
+            json.loads(recurrence_json)
+        except ValueError:
+            return "recurrence_json non è JSON valido"
+    return None
+
+
+def _check_recurrence(recurrence_json):
+    error = _recurrence_error(recurrence_json)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+
+
+def _message_error(message: str):
+    if not message:
+        return "Messaggio vuoto"
+    # Il messaggio è salvato con html.escape: il vincolo del DB vale dopo l'escape
+    if len(message) > 500:
+        return "Messaggio troppo lungo (max 500 caratteri dopo l'escape HTML)"
+    return None
+
+
+def _check_message(message: str):
+    error = _message_error(message)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'body'}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def _validate_new_reminder(raw, user_tz: str) -> tuple:
+    """
+    Valida un elemento da creare (bulk, import) con ReminderCreate.
+    Restituisce ((message, next_exec UTC, recurrence_json), None) oppure (None, errore).
+    """
+    if raw is _INVALID_LINE:
+        return None, "JSON non valido"
+    try:
+        item = ReminderCreate.model_validate(raw)
+    except ValidationError as e:
+        return None, _validation_message(e)
+    error = _message_error(item.message) or _recurrence_error(item.recurrence_json)
+    if error:
+        return None, error
+    return (item.message, _to_utc(item.next_execution, user_tz), item.recurrence_json or None), None
+
+
+async def _bulk_items(request: Request) -> list:
+    """Elementi del body: array JSON oppure NDJSON (un oggetto per riga)."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                items.append(_INVALID_LINE)
+    else:
+        try:
+            items = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="JSON non valido")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail="Atteso un array JSON di reminder")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Massimo {BULK_MAX_ITEMS} reminder per richiesta")
+    return items
+
+
+# ---------- Accesso DB (bloccante: chiamato dagli handler via run_db) ----------
+
+def _insert_reminders_bulk(user_id: int, items: list) -> list:
+    """
+    Inserisce [(message, next_exec, recurrence_json, status)] in un'unica
+    transazione. Restituisce gli id nell'ordine degli elementi.
+    """
+    conn = get_connection()
+    try:
+        # Una riga per INSERT: RETURNING dà l'id di ciascun elemento senza
+        # supporre id consecutivi (l'ordine di RETURNING su più righe non è garantito)
+        ids = [
+            conn.execute(
+                """INSERT INTO reminders (user_id, message, next_execution, next_execution_epoch,
+                                          recurrence_json, status)
+                   VALUES (?, ?, ?, ?, ?, ?) RETURNING id""",
+                (user_id, message, to_utc_str(when), to_epoch(when), recurrence, status),
+            ).fetchone()[0]
+            for message, when, recurrence, status in items
+        ]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return ids
+
+
+def _apply_bulk_action(user_id: int, action: str, ids: list) -> tuple:
+    """
+    Applica l'azione ai reminder dell'utente in un'unica transazione.
+    Restituisce (righe aggiornate, {id: errore} per quelli esclusi).
+    """
+    set_sql, allowed = BULK_ACTIONS[action]
+    now = datetime.now(timezone.utc).isoformat()
+    conn = get_connection()
+    try:
+        found = {r["id"]: r["status"] for r in conn.execute(
+            """SELECT id, status FROM reminders
+               WHERE user_id = ? AND id IN (SELECT value FROM json_each(?))""",
+            (user_id, json.dumps(ids)),
+        )}
+        errors = {}
+        targets = []
+        for reminder_id in ids:
+            status = found.get(reminder_id)
+            if status is None:
+                errors[reminder_id] = "Reminder non trovato"
+            elif status not in allowed:
+                errors[reminder_id] = f"Stato '{status}' non compatibile con {action}"
+            else:
+                targets.append(reminder_id)
+        conn.executemany(
+            f"UPDATE reminders SET {set_sql} WHERE id = :id",
+            [{"id": reminder_id, "now": now} for reminder_id in targets],
+        )
+        rows = conn.execute(
+            "SELECT * FROM reminders WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(targets),),
+        ).fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return rows, errors
+
+
+@router.get("")
+async def api_list_reminders(
+    request: Request,
+    cursor: str = None,
+    limit: int = PAGE_SIZE,
+    current_user: dict = Depends(get_current_user),
+):
+    """Pagina di reminder con gli stessi filtri di GET /reminders: {"items": [...], "next_cursor": ...}."""
+    filters = _list_filters(request.query_params)
+    rows, next_cursor = await run_db(
+        _fetch_reminders, current_user["id"], filters,
+        current_user.get("timezone", "Europe/Rome"), cursor, max(1, min(limit, MAX_PAGE_SIZE)),
+    )
+    return ORJSONResponse({"items": [_reminder_out(r) for r in rows], "next_cursor": next_cursor})
+
+
+@router.get("/{reminder_id}", response_model=ReminderOut)
+async def api_get_reminder(reminder_id: int, current_user: dict = Depends(get_current_user)):
+    row = await run_db(_get_user_reminder, reminder_id, current_user["id"])
+    if not row:
+        raise HTTPException(status_code=404, detail="Reminder non trovato")
+    return ORJSONResponse(_reminder_out(row))
+
+
+@router.post("", response_model=ReminderOut, status_code=201)
+async def api_create_reminder(body: ReminderCreate, current_user: dict = Depends(get_current_user)):
+    _check_message(body.message)
+    _check_recurrence(body.recurrence_json)
+    next_exec = _to_utc(body.next_execution, current_user.get("timezone", "Europe/Rome"))
+
+    reminder_id = await run_db(
+        _insert_reminder, current_user["id"], body.message, next_exec, body.recurrence_json or None
+    )
+    schedule_reminder(reminder_id, next_exec)
+    events.publish(current_user["id"], [reminder_id])
+    row = await run_db(_get_user_reminder, reminder_id, current_user["id"])
+    return ORJSONResponse(_reminder_out(row), status_code=201)
+
+
+@router.patch("/{reminder_id}", response_model=ReminderOut)
+async def api_update_reminder(
+    reminder_id: int,
+    body: ReminderUpdate,
+    current_user: dict = Depends(get_current_user),
+):
+    """Aggiornamento parziale: solo i campi presenti nel body (recurrence_json "" = nessuna ricorrenza)."""
+    row = await run_db(_get_user_reminder, reminder_id, current_user["id"])
+    if not row:
+        raise HTTPException(status_code=404, detail="Reminder non trovato")
+
+    fields = []
+    values = []
+    if body.message is not None:
+        _check_message(body.message)
+        fields.append("message = ?")
+        values.append(body.message)
+    if body.next_execution is not None:
+        next_exec = _to_utc(body.next_execution, current_user.get("timezone", "Europe/Rome"))
+        fields += ["next_execution = ?", "next_execution_epoch = ?"]
+        values += [to_utc_str(next_exec), to_epoch(next_exec)]
+    if body.recurrence_json is not None:
+        _check_recurrence(body.recurrence_json)
+        fields.append("recurrence_json = ?")
+        values.append(body.recurrence_json.strip() or None)
+    if body.status is not None:
+        fields.append("status = ?")
+        values.append(body.status)
+
+    if fields:
+        row = await run_db(_update_reminder_fields, reminder_id, fields, values)
+        sync_reminder(row)
+        events.publish(current_user["id"], [reminder_id])
+    return ORJSONResponse(_reminder_out(row))
+
+
+@router.delete("/{reminder_id}", status_code=204)
+async def api_delete_reminder(reminder_id: int, current_user: dict = Depends(get_current_user)):
+    """Eliminazione logica (status 'deleted'), come dalla UI."""
+    if not await run_db(_soft_delete_reminder, reminder_id, current_user["id"]):
+        raise HTTPException(status_code=404, detail="Reminder non trovato")
+    cancel_reminder(reminder_id)
+    events.publish(current_user["id"], [reminder_id])
+    return Response(status_code=204)
+
+
+@router.post("/bulk")
+async def api_bulk_create(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Crea più reminder in un'unica transazione. Body: array JSON di ReminderCreate
+    oppure NDJSON (Content-Type: application/x-ndjson). Gli elementi non validi
+    vengono scartati e segnalati: {"created": n, "results": [{"index", "id"|"error"}]}.
+    """
+    raw_items = await _bulk_items(request)
+    user_tz = current_user.get("timezone", "Europe/Rome")
+
+    results = []
+    valid = []
+    for index, raw in enumerate(raw_items):
+        item, error = _validate_new_reminder(raw, user_tz)
+        if error:
+            results.append({"index": index, "error": error})
+            continue
+        results.append({"index": index})
+        valid.append((len(results) - 1, (*item, "pending")))
+
+    if valid:
+        ids = await run_db(_insert_reminders_bulk, current_user["id"], [item for _, item in valid])
+        for (result_pos, (_, next_exec, _, _)), reminder_id in zip(valid, ids):
+            results[result_pos]["id"] = reminder_id
+            schedule_reminder(reminder_id, next_exec)
+        events.publish(current_user["id"], ids)
+
+    return ORJSONResponse({"created": len(valid), "results": results})
+
+
+@router.post("/bulk/status")
+async def api_bulk_status(body: ReminderBulkAction, current_user: dict = Depends(get_current_user)):
+    """
+    Pausa, ripresa, eliminazione o risoluzione di più reminder in un'unica
+    transazione: {"updated": n, "results": [{"id", "status"|"error"}]}.
+    """
+    ids = list(dict.fromkeys(body.ids))
+    rows, errors = await run_db(_apply_bulk_action, current_user["id"], body.action, ids)
+    for row in rows:
+        sync_reminder(row)
+    events.publish(current_user["id"], [row["id"] for row in rows])
+
+    status_by_id = {row["id"]: row["status"] for row in rows}
+    results = [
+        {"id": rid, "status": status_by_id[rid]} if rid in status_by_id else {"id": rid, "error": errors[rid]}
+        for rid in ids
+    ]
+    return ORJSONResponse({"updated": len(rows), "results": results})
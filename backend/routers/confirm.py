@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from backend.database import get_connection
 from backend.auth import get_current_user
+from backend import events
+from scheduler.due_queue import cancel_reminder, sync_reminder
+from scheduler.recurrence import is_recurring
 from datetime import datetime, timezone
 
 router = APIRouter(prefix="/confirm", tags=["confirm"])
@@ -35,12 +38,9 @@ def _apply_confirmation(conn, reminder_id: int, execution_id: int):
         conn.commit()
         return
 
-    has_recurrence = (
-        reminder["recurrence_json"]
-        and reminder["recurrence_json"] not in (None, "null", "")
-    )
-
-    if has_recurrence:
+    # Stesso criterio dello scheduler: una ricorrenza non interpretabile
+    # è trattata come reminder singolo
+    if is_recurring(reminder["recurrence_json"]):
         if reminder["status"] == "pending":
             # Già rimesso a pending dallo scheduler (non dovrebbe succedere, ma safe)
             pass
@@ -59,10 +59,17 @@ def _apply_confirmation(conn, reminder_id: int, execution_id: int):
         )
 
     conn.commit()
+    reminder = conn.execute(
+        "SELECT * FROM reminders WHERE id = ?", (reminder_id,)
+    ).fetchone()
+    sync_reminder(reminder)
+    events.publish_rows([reminder])
 
 
+# Handler sincroni: FastAPI li esegue nel threadpool, le query sqlite3
+# non bloccano l'event loop.
 @router.post("/{execution_id}")
-async def confirm_execution(
+def confirm_execution(
     execution_id: int,
     request: Request,
     current_user: dict = Depends(get_current_user),
@@ -89,7 +96,7 @@ async def confirm_execution(
 
 
 @router.post("/bot/{execution_id}")
-async def confirm_execution_bot(execution_id: int):
+def confirm_execution_bot(execution_id: int):
     """Endpoint chiamato dal bot Telegram."""
     conn = get_connection()
     execution = conn.execute(
@@ -106,7 +113,7 @@ async def confirm_execution_bot(execution_id: int):
 
 
 @router.post("/resolve/{reminder_id}")
-async def resolve_reminder(
+def resolve_reminder(
     reminder_id: int,
     request: Request,
     current_user: dict = Depends(get_current_user),
@@ -128,4 +135,6 @@ async def resolve_reminder(
     )
     conn.commit()
     conn.close()
+    cancel_reminder(reminder_id)
+    events.publish(current_user["id"], [reminder_id])
     return {"message": "Reminder risolto definitivamente"}
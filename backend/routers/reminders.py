@@ -1,79 +1,167 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from backend.database import get_connection
+from backend.database import get_connection, run_db, to_utc_str, to_epoch
 from backend.auth import get_current_user
-from datetime import datetime, timezone
+from backend import events
+from scheduler.due_queue import schedule_reminder, cancel_reminder, sync_reminder
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode, urlsplit
+import asyncio
+import html as _html
 import json
+import time
+import zlib
+from functools import lru_cache
 import pytz
+import yaml
+from jinja2 import FileSystemBytecodeCache
 
 router = APIRouter(prefix="/reminders", tags=["reminders"])
 
+# Commento SSE periodico: tiene viva la connessione e rileva i client chiusi
+SSE_PING_SEC = 20
+
+# Le etichette "oggi"/"domani" cambiano senza scritture: l'ETag include anche
+# il quarto d'ora corrente (copre i fusi con offset di :30 e :45)
+ETAG_TIME_BUCKET_SEC = 900
+
+# Paginazione della lista: righe per pagina e massimo per `limit` (il refresh
+# della pagina ricarica in una volta le righe già caricate con lo scroll)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Ordinamenti: colonne della chiave keyset (ultima = id, univoca) e direzione.
+# Ognuno ha il suo indice idx_reminders_list_* (backend/database.py)
+LIST_SORTS = {
+    "status": (("status_rank", "next_execution_epoch", "id"), "ASC"),
+    "date": (("next_execution_epoch", "id"), "ASC"),
+    "date_desc": (("next_execution_epoch", "id"), "DESC"),
+    "id": (("id",), "ASC"),
+    "id_desc": (("id",), "DESC"),
+}
+LIST_STATUSES = ("pending", "sent", "completed", "paused", "resolved", "deleted")
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
 templates = Jinja2Templates(directory=str(BASE_DIR / "frontend"))
+# Bytecode dei template su disco: al riavvio non vengono ricompilati
+_jinja_cache = BASE_DIR / CONFIG.get("jinja_cache_path", "data/jinja_cache")
+_jinja_cache.mkdir(parents=True, exist_ok=True)
+templates.env.bytecode_cache = FileSystemBytecodeCache(str(_jinja_cache))
+# In prod i template non cambiano: niente stat del file a ogni include (uno per riga)
+templates.env.auto_reload = CONFIG.get("app_env", "dev") == "dev"
+
+MONTHS_SHORT = ["gen", "feb", "mar", "apr", "mag", "giu", "lug", "ago", "set", "ott", "nov", "dic"]
+
+templates.env.filters["from_json"] = json.loads
+
+
+@lru_cache(maxsize=64)
+def _zone(tz_str: str):
+    """pytz.timezone in cache per stringa; None se il fuso non è valido."""
+    try:
+        return pytz.timezone(tz_str)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _recurrence_type(recurrence_json: str) -> str:
+    """Campo type di recurrence_json per il badge della lista ("" se assente o non valido)."""
+    try:
+        rec = json.loads(recurrence_json)
+    except (TypeError, ValueError):
+        return ""
+    return rec.get("type", "") if isinstance(rec, dict) else ""
+
+
+def _localize(dt, tz):
+    """datetime UTC (naive = UTC) nel fuso `tz`; invariato se il fuso non è valido."""
+    if tz is None:
+        return dt
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(tz)
 
-import json as _json
-import pytz as _pytz
 
-templates.env.filters["from_json"] = _json.loads
+def _short_label(local_dt, today) -> str:
+    """Data compatta — 'oggi HH:MM', 'domani HH:MM', '25 mar', '25 mar 27'."""
+    d = local_dt.date()
+    if d == today:
+        return f"oggi {local_dt.strftime('%H:%M')}"
+    if d == today + timedelta(days=1):
+        return f"domani {local_dt.strftime('%H:%M')}"
+    if d.year == today.year:
+        return f"{d.day} {MONTHS_SHORT[d.month - 1]}"
+    return f"{d.day} {MONTHS_SHORT[d.month - 1]} {str(d.year)[2:]}"
+
 
 def _to_local_filter(dt, tz_str="Europe/Rome"):
     """Filtro Jinja2: converte datetime UTC in ora locale."""
     if dt is None:
         return "—"
-    try:
-        tz = _pytz.timezone(tz_str)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        local_dt = dt.astimezone(tz)
-        return local_dt.strftime("%d/%m/%Y %H:%M")
-    except Exception:
-        return dt.strftime("%d/%m/%Y %H:%M") if dt else "—"
+    return _localize(dt, _zone(tz_str)).strftime("%d/%m/%Y %H:%M")
+
 
 def _to_local_input_filter(dt, tz_str="Europe/Rome"):
     """Filtro Jinja2: converte datetime UTC in formato datetime-local (YYYY-MM-DDTHH:MM)."""
     if dt is None:
         return ""
-    try:
-        tz = _pytz.timezone(tz_str)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        local_dt = dt.astimezone(tz)
-        return local_dt.strftime("%Y-%m-%dT%H:%M")
-    except Exception:
-        return dt.strftime("%Y-%m-%dT%H:%M") if dt else ""
+    return _localize(dt, _zone(tz_str)).strftime("%Y-%m-%dT%H:%M")
+
 
 def _to_local_short_filter(dt, tz_str="Europe/Rome"):
-    """Filtro Jinja2: data compatta — 'oggi HH:MM', 'domani HH:MM', '25 mar', '25 mar 27'."""
-    if dt is None:
-        return ""
-    try:
-        from datetime import date as _date, timedelta as _td
-        tz = _pytz.timezone(tz_str)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        local_dt = dt.astimezone(tz)
-        today = datetime.now(tz).date()
-        tomorrow = today + _td(days=1)
-        d = local_dt.date()
-        months = ["gen","feb","mar","apr","mag","giu","lug","ago","set","ott","nov","dic"]
-        if d == today:
-            return f"oggi {local_dt.strftime('%H:%M')}"
-        elif d == tomorrow:
-            return f"domani {local_dt.strftime('%H:%M')}"
-        elif d.year == today.year:
-            return f"{d.day} {months[d.month-1]}"
-        else:
-            return f"{d.day} {months[d.month-1]} {str(d.year)[2:]}"
-    except Exception:
+    """Filtro Jinja2: data compatta (vedi _short_label)."""
+    tz = _zone(tz_str)
+    if dt is None or tz is None:
         return ""
+    return _short_label(_localize(dt, tz), datetime.now(tz).date())
+
 
 templates.env.filters["to_local_short"] = _to_local_short_filter
 templates.env.filters["to_local"] = _to_local_filter
 templates.env.filters["to_local_input"] = _to_local_input_filter
 
 
+def _row_views(rows, user_tz: str) -> list:
+    """
+    Righe reminders → oggetti per partials/reminder_row.html con i campi di
+    visualizzazione già calcolati: fuso dalla cache e "oggi" una volta per
+    richiesta, una sola conversione di next_execution per riga. Attributi
+    invece di chiavi: Jinja prova getattr prima di [] e sui dict fallisce.
+    """
+    tz = _zone(user_tz)
+    today = datetime.now(tz).date() if tz else None
+    views = []
+    for row in rows:
+        r = dict(row)
+        dt = r["next_execution"]
+        if isinstance(dt, str):
+            try:
+                dt = datetime.fromisoformat(dt) if dt else None
+            except ValueError:
+                dt = None
+        local = _localize(dt, tz) if dt is not None else None
+        rec = r["recurrence_json"]
+        recurring = bool(rec) and rec != "null"
+        r.update(
+            next_execution=dt,
+            next_local=local.strftime("%d/%m/%Y %H:%M") if local else "—",
+            next_input=local.strftime("%Y-%m-%dT%H:%M") if local else "",
+            next_short=_short_label(local, today) if local and tz else "",
+            recurring=recurring,
+            rec_type=_recurrence_type(rec) if recurring else "",
+        )
+        views.append(SimpleNamespace(**r))
+    return views
+
+
 def _localize_to_utc(dt_str: str, user_tz: str) -> datetime:
     """
     Converte una stringa datetime-local (es. "2026-02-23T09:50")
@@ -104,83 +192,302 @@ def _row_to_dict(row) -> dict:
     return d
 
 
-def _get_reminders_html(
-    request: Request,
-    user_id: int,
-    user_tz: str = "Europe/Rome",
-    sort: str = "status",
-    show_deleted: bool = False,
-) -> HTMLResponse:
-    """Restituisce la lista reminder come HTML fragment per HTMX."""
-    conn = get_connection()
+def _list_where(user_id: int, filters: dict, user_tz: str) -> tuple:
+    """Condizioni SQL dei filtri della lista: (clausola WHERE, parametri)."""
+    where = ["user_id = ?"]
+    params = [user_id]
 
-    if show_deleted:
-        where = "WHERE user_id = ?"
-        params = (user_id,)
-    else:
-        where = "WHERE user_id = ? AND status != 'deleted'"
-        params = (user_id,)
-
-    if sort == "date":
-        order = "ORDER BY next_execution ASC"
-    elif sort == "date_desc":
-        order = "ORDER BY next_execution DESC"
-    elif sort == "id":
-        order = "ORDER BY id ASC"
-    elif sort == "id_desc":
-        order = "ORDER BY id DESC"
-    else:  # default: per stato
-        order = """ORDER BY
-               CASE status
-                   WHEN 'pending' THEN 1
-                   WHEN 'sent' THEN 2
-                   WHEN 'completed' THEN 3
-                   WHEN 'paused' THEN 4
-                   WHEN 'resolved' THEN 5
-                   WHEN 'deleted' THEN 6
-                   ELSE 7
-               END, next_execution ASC"""
+    if filters["status"]:
+        where.append(f"status IN ({', '.join('?' * len(filters['status']))})")
+        params.extend(filters["status"])
+    elif not filters["show_deleted"]:
+        where.append("status != 'deleted'")
+
+    # Intervallo di date in giorni locali dell'utente: [dal 00:00, al+1 00:00)
+    for key, op, days in (("date_from", ">=", 0), ("date_to", "<", 1)):
+        if filters[key]:
+            day = datetime.strptime(filters[key], "%Y-%m-%d") + timedelta(days=days)
+            where.append(f"next_execution_epoch {op} ?")
+            params.append(to_epoch(_localize_to_utc(day.isoformat(), user_tz)))
+
+    if filters["q"]:
+        # I messaggi sono salvati con html.escape: la ricerca va fatta sullo stesso formato
+        pattern = _html.escape(filters["q"]).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("message LIKE ? ESCAPE '\\'")
+        params.append(f"%{pattern}%")
+
+    return " AND ".join(where), params
 
+
+def _encode_cursor(sort: str, row: dict) -> str:
+    return f"{sort}:" + ".".join(str(row[col]) for col in LIST_SORTS[sort][0])
+
+
+def _decode_cursor(sort: str, cursor: str) -> list:
+    """Valori della chiave di ordinamento dell'ultima riga della pagina precedente."""
+    cursor_sort, _, values = cursor.partition(":")
+    try:
+        values = [int(v) for v in values.split(".")]
+    except ValueError:
+        values = []
+    if cursor_sort != sort or len(values) != len(LIST_SORTS[sort][0]):
+        raise HTTPException(status_code=400, detail="Cursore non valido")
+    return values
+
+
+def _fetch_reminders(user_id: int, filters: dict, user_tz: str,
+                     cursor: str = None, limit: int = PAGE_SIZE) -> tuple:
+    """
+    Legge una pagina di reminder nell'ordine richiesto (bloccante: usare via run_db).
+    Paginazione keyset: la pagina successiva parte dalla chiave dell'ultima riga,
+    sull'indice dell'ordinamento, senza OFFSET. Restituisce (righe, cursore o None).
+    """
+    sort = filters["sort"]
+    columns, direction = LIST_SORTS[sort]
+    where, params = _list_where(user_id, filters, user_tz)
+    if cursor:
+        op = ">" if direction == "ASC" else "<"
+        where += f" AND ({', '.join(columns)}) {op} ({', '.join('?' * len(columns))})"
+        params.extend(_decode_cursor(sort, cursor))
+    order = ", ".join(f"{col} {direction}" for col in columns)
+
+    conn = get_connection()
     rows = conn.execute(
-        f"SELECT * FROM reminders {where} {order}", params
+        f"SELECT * FROM reminders WHERE {where} ORDER BY {order} LIMIT ?", (*params, limit + 1)
     ).fetchall()
     conn.close()
-    reminders = [_row_to_dict(r) for r in rows]
+
+    next_cursor = _encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _fetch_list_row(reminder_id: int, user_id: int, filters: dict, user_tz: str):
+    """Il reminder se è visibile con i filtri correnti, altrimenti None."""
+    where, params = _list_where(user_id, filters, user_tz)
+    conn = get_connection()
+    row = conn.execute(
+        f"SELECT * FROM reminders WHERE id = ? AND {where}", (reminder_id, *params)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+async def _get_reminders_html(
+    request: Request,
+    user_id: int,
+    user_tz: str = "Europe/Rome",
+    filters: dict = None,
+    cursor: str = None,
+    limit: int = PAGE_SIZE,
+) -> HTMLResponse:
+    """
+    Restituisce la lista reminder come HTML fragment per HTMX: la tabella con
+    la prima pagina o, con `cursor`, solo le righe della pagina successiva.
+    Ogni pagina termina con una riga sentinella che carica la seguente quando
+    diventa visibile (scroll infinito).
+    """
+    filters = filters or _list_filters({})
+    reminders, next_cursor = await run_db(_fetch_reminders, user_id, filters, user_tz, cursor, limit)
+    next_url = None
+    if next_cursor:
+        next_url = "/reminders?" + urlencode({**_filters_query(filters), "cursor": next_cursor})
     return templates.TemplateResponse(
-        "partials/reminders_list.html",
-        {"request": request, "reminders": reminders, "user_tz": user_tz,
-         "sort": sort, "show_deleted": show_deleted},
+        "partials/reminders_page.html" if cursor else "partials/reminders_list.html",
+        {"request": request, "reminders": _row_views(reminders, user_tz), "user_tz": user_tz,
+         "sort": filters["sort"], "show_deleted": filters["show_deleted"],
+         "filtered": bool(filters["status"] or filters["q"] or filters["date_from"] or filters["date_to"]),
+         "next_url": next_url},
     )
 
 
+def _list_etag(user_id: int, query: str) -> str:
+    bucket = int(time.time()) // ETAG_TIME_BUCKET_SEC
+    version = events.get_version(user_id)
+    query_hash = format(zlib.crc32(query.encode()), "x")
+    return f'W/"{events.BOOT_ID}-{user_id}-{version}-{query_hash}-{bucket}"'
+
+
 @router.get("", response_class=HTMLResponse)
 async def list_reminders(
     request: Request,
-    sort: str = "status",
-    show_deleted: bool = False,
-    current_user: dict = Depends(get_current_user)
+    cursor: str = None,
+    limit: int = PAGE_SIZE,
 ):
-    return _get_reminders_html(
+    """
+    Lista reminder paginata. Filtri e ordinamento: vedi _list_filters();
+    `cursor` (dalla riga sentinella) restituisce solo le righe della pagina successiva.
+    """
+    # ETag calcolato prima della lettura: una scrittura concorrente porta a una
+    # versione nuova e quindi a un nuovo render alla richiesta successiva
+    user_id = request.session.get("user_id")
+    etag = _list_etag(user_id, str(request.query_params)) if user_id else None
+    if etag and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    filters = _list_filters(request.query_params)
+    current_user = await run_db(get_current_user, request)
+    response = await _get_reminders_html(
         request, current_user["id"],
         current_user.get("timezone", "Europe/Rome"),
-        sort, show_deleted
+        filters, cursor, max(1, min(limit, MAX_PAGE_SIZE)),
+    )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@router.get("/events")
+async def reminder_events(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Stream SSE delle modifiche ai reminder dell'utente: `event: changed` con
+    {"ids": [...]} oppure {"reset": true} se la pagina deve ricaricare la lista.
+    """
+    user_id = current_user["id"]
+    sub = events.subscribe(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await sub.next_event(SSE_PING_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: changed\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(user_id, sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{reminder_id}/row", response_class=HTMLResponse)
+async def reminder_row(
+    reminder_id: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Singola riga della lista (vuota se il reminder non è visibile con i filtri correnti)."""
+    user_tz = current_user.get("timezone", "Europe/Rome")
+    filters = _list_filters(request.query_params)
+    row = await run_db(_fetch_list_row, reminder_id, current_user["id"], filters, user_tz)
+    if not row:
+        return HTMLResponse("")
+    return templates.TemplateResponse(
+        "partials/reminder_row.html",
+        {"request": request, "r": _row_views([row], user_tz)[0], "user_tz": user_tz},
     )
 
 
-def _filter_params(request: Request) -> tuple:
-    """Estrae i parametri di filtro dagli header HTMX o dai query params."""
-    sort = request.query_params.get("sort", "status")
-    show_deleted = request.query_params.get("show_deleted", "false").lower() == "true"
-    # HTMX manda i parametri nel header HX-Current-URL
-    current_url = request.headers.get("hx-current-url", "")
-    if "sort=" in current_url:
-        import re
-        m = re.search(r"sort=([^&]+)", current_url)
-        if m:
-            sort = m.group(1)
-    if "show_deleted=true" in current_url:
-        show_deleted = True
-    return sort, show_deleted
+def _list_filters(params) -> dict:
+    """
+    Ordinamento e filtri della lista dai query params:
+    sort, show_deleted, status (separati da virgola), q (testo), from/to (YYYY-MM-DD).
+    """
+    sort = params.get("sort", "status")
+    statuses = [st for st in params.get("status", "").split(",") if st]
+    if any(st not in LIST_STATUSES for st in statuses):
+        raise HTTPException(status_code=400, detail="Stato non valido")
+    filters = {
+        "sort": sort if sort in LIST_SORTS else "status",
+        "show_deleted": params.get("show_deleted", "false").lower() == "true",
+        "status": statuses,
+        "q": params.get("q", "").strip()[:100],
+        "date_from": params.get("from", ""),
+        "date_to": params.get("to", ""),
+    }
+    for key in ("date_from", "date_to"):
+        if filters[key]:
+            try:
+                datetime.strptime(filters[key], "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Data non valida")
+    return filters
+
+
+def _filters_query(filters: dict) -> dict:
+    """Query params equivalenti ai filtri (solo quelli impostati)."""
+    query = {"sort": filters["sort"], "show_deleted": str(filters["show_deleted"]).lower()}
+    for key, param in (("q", "q"), ("date_from", "from"), ("date_to", "to")):
+        if filters[key]:
+            query[param] = filters[key]
+    if filters["status"]:
+        query["status"] = ",".join(filters["status"])
+    return query
+
+
+def _filter_params(request: Request) -> dict:
+    """
+    Filtri della lista da rimandare dopo create/update/delete: query params
+    della richiesta più quelli della pagina (header HTMX HX-Current-URL, che
+    la dashboard tiene allineato ai filtri), questi ultimi con precedenza.
+    """
+    params = dict(request.query_params)
+    current_query = urlsplit(request.headers.get("hx-current-url", "")).query
+    page_params = {key: values[0] for key, values in parse_qs(current_query).items()}
+    try:
+        return _list_filters({**params, **page_params})
+    except HTTPException:
+        return _list_filters(params)  # URL della pagina con filtri non validi: ignorati
+
+
+# ---------- Accesso DB (bloccante: chiamato dagli handler via run_db) ----------
+
+def _get_user_reminder(reminder_id: int, user_id: int):
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT * FROM reminders WHERE id = ? AND user_id = ?",
+        (reminder_id, user_id),
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def _insert_reminder(user_id: int, message: str, next_exec: datetime, recurrence_json) -> int:
+    conn = get_connection()
+    cur = conn.execute(
+        """INSERT INTO reminders (user_id, message, next_execution, next_execution_epoch,
+                                  recurrence_json, status)
+           VALUES (?, ?, ?, ?, ?, 'pending')""",
+        (user_id, message, to_utc_str(next_exec), to_epoch(next_exec), recurrence_json),
+    )
+    conn.commit()
+    conn.close()
+    return cur.lastrowid
+
+
+def _update_reminder_fields(reminder_id: int, fields: list, values: list):
+    """Applica l'UPDATE e restituisce la riga aggiornata."""
+    conn = get_connection()
+    conn.execute(
+        f"UPDATE reminders SET {', '.join(fields)} WHERE id = ?", [*values, reminder_id]
+    )
+    conn.commit()
+    row = conn.execute("SELECT * FROM reminders WHERE id = ?", (reminder_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def _soft_delete_reminder(reminder_id: int, user_id: int) -> bool:
+    conn = get_connection()
+    now = datetime.now(timezone.utc).isoformat()
+    cur = conn.execute(
+        """UPDATE reminders SET status = 'deleted', deleted_at = ?
+           WHERE id = ? AND user_id = ?""",
+        (now, reminder_id, user_id),
+    )
+    conn.commit()
+    conn.close()
+    return cur.rowcount > 0
 
 
 @router.post("", response_class=HTMLResponse, status_code=201)
@@ -198,7 +505,6 @@ async def create_reminder(
     if not message or not next_execution_str:
         raise HTTPException(status_code=400, detail="Campi obbligatori mancanti")
 
-    import html as _html
     message = _html.escape(message[:500])
 
     # Costruisci recurrence_json se non fornito direttamente
@@ -213,16 +519,11 @@ async def create_reminder(
     except ValueError:
         raise HTTPException(status_code=400, detail="Data non valida")
 
-    conn = get_connection()
-    conn.execute(
-        """INSERT INTO reminders (user_id, message, next_execution, recurrence_json, status)
-           VALUES (?, ?, ?, ?, 'pending')""",
-        (current_user["id"], message, next_exec.isoformat(), recurrence_json),
-    )
-    conn.commit()
-    conn.close()
-    sort, show_deleted = _filter_params(request)
-    return _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), sort, show_deleted)
+    reminder_id = await run_db(_insert_reminder, current_user["id"], message, next_exec, recurrence_json)
+    schedule_reminder(reminder_id, next_exec)
+    events.publish(current_user["id"], [reminder_id])
+    filters = _filter_params(request)
+    return await _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), filters)
 
 
 @router.put("/{reminder_id}", response_class=HTMLResponse)
@@ -231,13 +532,8 @@ async def update_reminder(
     request: Request,
     current_user: dict = Depends(get_current_user),
 ):
-    conn = get_connection()
-    row = conn.execute(
-        "SELECT * FROM reminders WHERE id = ? AND user_id = ?",
-        (reminder_id, current_user["id"]),
-    ).fetchone()
+    row = await run_db(_get_user_reminder, reminder_id, current_user["id"])
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Reminder non trovato")
 
     # Supporta sia JSON body che form data
@@ -258,15 +554,15 @@ async def update_reminder(
     fields = []
     values = []
     if message is not None:
-        import html as _html
         fields.append("message = ?")
         values.append(_html.escape(str(message)[:500]))
     if next_exec_str:
         try:
+            next_exec = _localize_to_utc(str(next_exec_str), current_user.get("timezone", "Europe/Rome"))
             fields.append("next_execution = ?")
-            values.append(
-                _localize_to_utc(str(next_exec_str), current_user.get("timezone", "Europe/Rome")).isoformat()
-            )
+            values.append(to_utc_str(next_exec))
+            fields.append("next_execution_epoch = ?")
+            values.append(to_epoch(next_exec))
         except ValueError:
             pass
     if recurrence_json is not None:
@@ -283,14 +579,10 @@ async def update_reminder(
             values.append(status)
 
     if fields:
-        values.append(reminder_id)
-        conn.execute(
-            f"UPDATE reminders SET {', '.join(fields)} WHERE id = ?", values
-        )
-        conn.commit()
-    conn.close()
-    sort, show_deleted = _filter_params(request)
-    return _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), sort, show_deleted)
+        sync_reminder(await run_db(_update_reminder_fields, reminder_id, fields, values))
+        events.publish(current_user["id"], [reminder_id])
+    filters = _filter_params(request)
+    return await _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), filters)
 
 
 @router.delete("/{reminder_id}", response_class=HTMLResponse)
@@ -299,24 +591,12 @@ async def delete_reminder(
     request: Request,
     current_user: dict = Depends(get_current_user),
 ):
-    conn = get_connection()
-    row = conn.execute(
-        "SELECT * FROM reminders WHERE id = ? AND user_id = ?",
-        (reminder_id, current_user["id"]),
-    ).fetchone()
-    if not row:
-        conn.close()
+    if not await run_db(_soft_delete_reminder, reminder_id, current_user["id"]):
         raise HTTPException(status_code=404, detail="Reminder non trovato")
-
-    now = datetime.now(timezone.utc).isoformat()
-    conn.execute(
-        "UPDATE reminders SET status = 'deleted', deleted_at = ? WHERE id = ?",
-        (now, reminder_id),
-    )
-    conn.commit()
-    conn.close()
-    sort, show_deleted = _filter_params(request)
-    return _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), sort, show_deleted)
+    cancel_reminder(reminder_id)
+    events.publish(current_user["id"], [reminder_id])
+    filters = _filter_params(request)
+    return await _get_reminders_html(request, current_user["id"], current_user.get("timezone", "Europe/Rome"), filters)
 
 
 
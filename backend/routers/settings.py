@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 from backend.auth import get_current_user, hash_password, verify_password
-from backend.database import set_setting, get_telegram_config, get_connection
+from backend.database import set_setting, get_telegram_config, get_connection, run_db
+import asyncio
 import json
-import requests as req_lib
+import httpx
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
 
 @router.get("")
-async def get_settings(current_user: dict = Depends(get_current_user)):
+def get_settings(current_user: dict = Depends(get_current_user)):
     cfg = get_telegram_config()
     token = cfg.get("telegram_token", "")
     chat_ids = cfg.get("chat_ids", [])
@@ -35,14 +36,15 @@ async def save_token(
 
     # Verifica validità token
     try:
-        resp = req_lib.get(f"https://api.telegram.org/bot{token}/getMe", timeout=5)
+        async with httpx.AsyncClient(timeout=5) as client:
+            resp = await client.get(f"https://api.telegram.org/bot{token}/getMe")
         if resp.status_code != 200:
             return JSONResponse(status_code=400, content={"error": "Token non valido — verificalo su @BotFather"})
         bot_name = resp.json().get("result", {}).get("username", "")
     except Exception as e:
         return JSONResponse(status_code=400, content={"error": f"Impossibile raggiungere Telegram: {e}"})
 
-    set_setting("telegram_token", token)
+    await run_db(set_setting, "telegram_token", token)
     return {"message": f"Token salvato — bot: @{bot_name}"}
 
 
@@ -67,7 +69,7 @@ async def save_chat_ids(
                     content={"error": f"Chat ID non valido: '{part}'"}
                 )
 
-    set_setting("telegram_chat_ids", json.dumps(chat_ids))
+    await run_db(set_setting, "telegram_chat_ids", json.dumps(chat_ids))
     return {"message": "Chat IDs aggiornati", "chat_ids": chat_ids}
 
 
@@ -81,43 +83,37 @@ async def test_telegram(current_user: dict = Depends(get_current_user)):
     if not token or not chat_ids:
         return JSONResponse(status_code=400, content={"error": "Token o Chat IDs non configurati"})
 
-    results = []
-    for chat_id in chat_ids:
+    async def _send_test(client: httpx.AsyncClient, chat_id: int) -> dict:
         try:
-            resp = req_lib.post(
+            resp = await client.post(
                 f"https://api.telegram.org/bot{token}/sendMessage",
                 json={"chat_id": chat_id, "text": "✅ Test connessione Reminder System — funziona!"},
-                timeout=5,
             )
-            results.append({"chat_id": chat_id, "ok": resp.status_code == 200})
+            return {"chat_id": chat_id, "ok": resp.status_code == 200}
         except Exception as e:
-            results.append({"chat_id": chat_id, "ok": False, "error": str(e)})
+            return {"chat_id": chat_id, "ok": False, "error": str(e)}
+
+    # Invii in parallelo: il tempo totale è quello della chat più lenta
+    async with httpx.AsyncClient(timeout=5) as client:
+        results = await asyncio.gather(*(_send_test(client, chat_id) for chat_id in chat_ids))
+    results = list(results)
 
     all_ok = all(r["ok"] for r in results)
     return {"message": "Test completato", "results": results, "all_ok": all_ok}
 
 
-@router.post("/account")
-async def update_account(
-    request: Request,
-    current_user: dict = Depends(get_current_user),
-):
-    """Aggiorna username e/o password dell'utente corrente."""
-    form = await request.form()
-    new_username = str(form.get("new_username", "")).strip()
-    current_password = str(form.get("current_password", "")).strip()
-    new_password = str(form.get("new_password", "")).strip()
-    confirm_password = str(form.get("confirm_password", "")).strip()
-
-    if not current_password:
-        return JSONResponse(status_code=400, content={"error": "Inserisci la password attuale per confermare"})
-
+def _update_account(user_id: int, new_username: str, current_password: str,
+                    new_password: str, confirm_password: str) -> tuple:
+    """
+    Verifica la password attuale e applica le modifiche all'account.
+    Restituisce (errore, riga utente, campi aggiornati); errore è None se ok.
+    """
     # Verifica password attuale
     conn = get_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (current_user["id"],)).fetchone()
+    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
     if not user or not verify_password(current_password, user["password_hash"]):
         conn.close()
-        return JSONResponse(status_code=400, content={"error": "Password attuale non corretta"})
+        return "Password attuale non corretta", user, []
 
     fields, values = [], []
 
@@ -125,11 +121,11 @@ async def update_account(
     if new_username and new_username != user["username"]:
         existing = conn.execute(
             "SELECT id FROM users WHERE username = ? AND id != ?",
-            (new_username, current_user["id"])
+            (new_username, user_id)
         ).fetchone()
         if existing:
             conn.close()
-            return JSONResponse(status_code=400, content={"error": f"Username '{new_username}' già in uso"})
+            return f"Username '{new_username}' già in uso", user, []
         fields.append("username = ?")
         values.append(new_username)
 
@@ -137,21 +133,46 @@ async def update_account(
     if new_password:
         if len(new_password) < 6:
             conn.close()
-            return JSONResponse(status_code=400, content={"error": "La nuova password deve essere di almeno 6 caratteri"})
+            return "La nuova password deve essere di almeno 6 caratteri", user, []
         if new_password != confirm_password:
             conn.close()
-            return JSONResponse(status_code=400, content={"error": "Le password non coincidono"})
+            return "Le password non coincidono", user, []
         fields.append("password_hash = ?")
         values.append(hash_password(new_password))
 
     if not fields:
         conn.close()
-        return JSONResponse(status_code=400, content={"error": "Nessuna modifica da applicare"})
+        return "Nessuna modifica da applicare", user, []
 
-    values.append(current_user["id"])
+    values.append(user_id)
     conn.execute(f"UPDATE users SET {', '.join(fields)} WHERE id = ?", values)
     conn.commit()
     conn.close()
+    return None, user, fields
+
+
+@router.post("/account")
+async def update_account(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+):
+    """Aggiorna username e/o password dell'utente corrente."""
+    form = await request.form()
+    new_username = str(form.get("new_username", "")).strip()
+    current_password = str(form.get("current_password", "")).strip()
+    new_password = str(form.get("new_password", "")).strip()
+    confirm_password = str(form.get("confirm_password", "")).strip()
+
+    if not current_password:
+        return JSONResponse(status_code=400, content={"error": "Inserisci la password attuale per confermare"})
+
+    # Query e bcrypt sono bloccanti: eseguiti nell'executor DB
+    error, user, fields = await run_db(
+        _update_account, current_user["id"], new_username, current_password,
+        new_password, confirm_password,
+    )
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
 
     # Aggiorna la sessione se è cambiato lo username
     if new_username and new_username != user["username"]:
@@ -0,0 +1,357 @@
+"""
+Export e import dei dati: reminder (CSV, NDJSON, iCalendar) e storico executions (CSV, NDJSON).
+
+Gli export sono generatori: le righe vengono lette a blocchi di EXPORT_CHUNK
+in ordine di id (keyset), ognuno con una connessione presa e rilasciata dal
+pool, e scritte subito nella risposta. La memoria resta costante e nessuna
+transazione di lettura resta aperta per tutta la durata del download (che
+impedirebbe ai checkpoint WAL di completarsi).
+
+L'import legge il body in streaming su un file temporaneo (in memoria fino a
+IMPORT_SPOOL_BYTES) e inserisce a blocchi di IMPORT_CHUNK righe, una
+transazione per blocco. Nei file esportati il messaggio è in chiaro (senza
+escape HTML) e le date sono UTC ISO 8601.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, timezone
+from html import unescape
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from backend import events
+from backend.auth import get_current_user
+from backend.database import get_connection, run_db
+from backend.routers.api import NDJSON_TYPES, _INVALID_LINE, _insert_reminders_bulk, _validate_new_reminder
+from scheduler.due_queue import schedule_reminder
+
+router = APIRouter(prefix="/api/v1", tags=["transfer"])
+
+EXPORT_CHUNK = 1000
+IMPORT_CHUNK = 500
+IMPORT_SPOOL_BYTES = 1024 * 1024
+IMPORT_MAX_BYTES = 50 * 1024 * 1024
+# Errori riportati nella risposta dell'import (gli altri sono solo contati)
+IMPORT_MAX_ERRORS = 100
+
+REMINDER_COLUMNS = ("id", "message", "next_execution", "recurrence_json", "status",
+                    "created_at", "deleted_at", "last_sent_at")
+EXECUTION_COLUMNS = ("id", "reminder_id", "message", "sent_at", "confirmed", "confirmed_at")
+TIMESTAMP_COLUMNS = ("next_execution", "created_at", "deleted_at", "last_sent_at", "sent_at", "confirmed_at")
+
+# Stati accettati dall'import: 'sent' (in attesa di una conferma che non arriverà) torna 'pending'
+IMPORT_STATUSES = {"pending": "pending", "sent": "pending", "completed": "completed",
+                   "paused": "paused", "resolved": "resolved"}
+
+# recurrence_json.type → FREQ di RRULE (RFC 5545)
+RRULE_FREQ = {"minutely": "MINUTELY", "hourly": "HOURLY", "daily": "DAILY",
+              "weekly": "WEEKLY", "monthly": "MONTHLY", "yearly": "YEARLY"}
+# Nel calendario solo i reminder ancora attivi
+ICS_STATUSES = ("pending", "sent", "completed")
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson",
+               "ics": "text/calendar; charset=utf-8"}
+
+
+def _iso_utc(value):
+    """Timestamp del DB (naive = UTC, con 'T' o spazio) → 'YYYY-MM-DDTHH:MM:SSZ'."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _export_row(row) -> dict:
+    d = dict(row)
+    d["message"] = unescape(d["message"])
+    for col in TIMESTAMP_COLUMNS:
+        if col in d:
+            d[col] = _iso_utc(d[col])
+    if "confirmed" in d:
+        d["confirmed"] = bool(d["confirmed"])
+    return d
+
+
+# ---------- Accesso DB (bloccante: i generatori girano nel threadpool di Starlette) ----------
+
+def _reminders_chunk(user_id: int, statuses, after_id: int) -> list:
+    where = ""
+    params = [user_id, after_id]
+    if statuses:
+        where = f"AND status IN ({', '.join('?' * len(statuses))})"
+        params.extend(statuses)
+    conn = get_connection()
+    rows = conn.execute(
+        f"""SELECT {', '.join(REMINDER_COLUMNS)} FROM reminders
+            WHERE user_id = ? AND id > ? {where}
+            ORDER BY id LIMIT ?""",
+        (*params, EXPORT_CHUNK),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _executions_chunk(user_id: int, reminder_id, after_id: int) -> list:
+    where = ""
+    params = [user_id, after_id]
+    if reminder_id is not None:
+        where = "AND e.reminder_id = ?"
+        params.append(reminder_id)
+    conn = get_connection()
+    rows = conn.execute(
+        f"""SELECT e.id, e.reminder_id, r.message, e.sent_at, e.confirmed, e.confirmed_at
+            FROM executions e JOIN reminders r ON r.id = e.reminder_id
+            WHERE r.user_id = ? AND e.id > ? {where}
+            ORDER BY e.id LIMIT ?""",
+        (*params, EXPORT_CHUNK),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _iter_rows(fetch, *args):
+    """Righe esportate, un blocco keyset alla volta."""
+    after_id = 0
+    while True:
+        rows = fetch(*args, after_id)
+        if not rows:
+            return
+        after_id = rows[-1]["id"]
+        yield [_export_row(r) for r in rows]
+
+
+# ---------- Formati ----------
+
+def _csv_stream(chunks, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield buf.getvalue()
+    for rows in chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([row[c] for c in columns] for row in rows)
+        yield buf.getvalue()
+
+
+def _ndjson_stream(chunks):
+    for rows in chunks:
+        yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def _ics_text(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_line(line: str) -> str:
+    """Riga iCalendar piegata a 75 ottetti senza spezzare i caratteri UTF-8."""
+    data = line.encode()
+    parts = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:  # byte di continuazione UTF-8
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+        limit = 74  # le righe di continuazione iniziano con uno spazio
+    parts.append(data.decode())
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_rrule(recurrence_json):
+    if not recurrence_json:
+        return None
+    try:
+        rec = json.loads(recurrence_json)
+        freq = RRULE_FREQ.get(rec.get("type"))
+        interval = max(int(rec.get("interval", 1)), 1)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return f"FREQ={freq};INTERVAL={interval}" if freq else None
+
+
+def _ics_stream(chunks):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Reminder System//IT\r\n"
+           "CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n")
+    for rows in chunks:
+        out = []
+        for row in rows:
+            summary = _ics_text(row["message"])
+            out += [
+                "BEGIN:VEVENT\r\n",
+                f"UID:reminder-{row['id']}@reminder-system\r\n",
+                f"DTSTAMP:{stamp}\r\n",
+                f"DTSTART:{row['next_execution'].replace('-', '').replace(':', '')}\r\n",
+                _ics_line(f"SUMMARY:{summary}"),
+            ]
+            rrule = _ics_rrule(row["recurrence_json"])
+            if rrule:
+                out.append(f"RRULE:{rrule}\r\n")
+            out += [
+                "BEGIN:VALARM\r\nACTION:DISPLAY\r\nTRIGGER:PT0S\r\n",
+                _ics_line(f"DESCRIPTION:{summary}"),
+                "END:VALARM\r\nEND:VEVENT\r\n",
+            ]
+        yield "".join(out)
+    yield "END:VCALENDAR\r\n"
+
+
+def _download(stream, fmt: str, name: str) -> StreamingResponse:
+    filename = f"{name}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+
+@router.get("/export/reminders")
+def export_reminders(
+    format: str = "csv",
+    include_deleted: bool = False,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Export dei reminder: `format` csv | ndjson | ics. Il calendario contiene solo
+    i reminder attivi, con la ricorrenza come RRULE e un allarme all'orario.
+    """
+    if format == "ics":
+        statuses = ICS_STATUSES
+    elif format in ("csv", "ndjson"):
+        statuses = None if include_deleted else ("pending", "sent", "completed", "paused", "resolved")
+    else:
+        raise HTTPException(status_code=400, detail="Formato non supportato (csv, ndjson, ics)")
+
+    chunks = _iter_rows(_reminders_chunk, current_user["id"], statuses)
+    if format == "csv":
+        stream = _csv_stream(chunks, REMINDER_COLUMNS)
+    elif format == "ndjson":
+        stream = _ndjson_stream(chunks)
+    else:
+        stream = _ics_stream(chunks)
+    return _download(stream, format, "reminders")
+
+
+@router.get("/export/executions")
+def export_executions(
+    format: str = "csv",
+    reminder_id: int = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """Export dello storico invii (executions ancora presenti, vedi retention): csv | ndjson."""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato non supportato (csv, ndjson)")
+    chunks = _iter_rows(_executions_chunk, current_user["id"], reminder_id)
+    stream = _csv_stream(chunks, EXECUTION_COLUMNS) if format == "csv" else _ndjson_stream(chunks)
+    return _download(stream, format, "executions")
+
+
+# ---------- Import ----------
+
+def _import_records(text, fmt: str):
+    """(numero riga/record, dict) dal file: CSV con intestazione oppure NDJSON."""
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield number, _INVALID_LINE
+
+
+def _flush_import(user_id: int, batch: list) -> int:
+    """Inserisce un blocco (una transazione) e mette in coda i reminder pending."""
+    ids = _insert_reminders_bulk(user_id, batch)
+    for reminder_id, (_, next_exec, _, status) in zip(ids, batch):
+        if status == "pending":
+            schedule_reminder(reminder_id, next_exec)
+    events.publish(user_id, ids)
+    return len(ids)
+
+
+def _import_reminders(fileobj, fmt: str, user_id: int, user_tz: str) -> dict:
+    """Importa i reminder dal file (bloccante: usare via run_db)."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="" if fmt == "csv" else None)
+    created = failed = 0
+    errors = []
+    batch = []
+    try:
+        for number, record in _import_records(text, fmt):
+            item = error = None
+            if isinstance(record, dict):
+                status = IMPORT_STATUSES.get(record.get("status") or "pending")
+                raw = {key: record.get(key) or None for key in ("message", "next_execution", "recurrence_json")}
+                if isinstance(raw["recurrence_json"], dict):
+                    raw["recurrence_json"] = json.dumps(raw["recurrence_json"])
+                item, error = _validate_new_reminder(raw, user_tz)
+                if not error and status is None:
+                    error = f"Stato non importabile: {record.get('status')}"
+            else:
+                error = "JSON non valido" if record is _INVALID_LINE else "Atteso un oggetto"
+            if error:
+                failed += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"line": number, "error": error})
+                continue
+            batch.append((*item, status))
+            if len(batch) >= IMPORT_CHUNK:
+                created += _flush_import(user_id, batch)
+                batch = []
+        if batch:
+            created += _flush_import(user_id, batch)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Le righe dei blocchi già inseriti restano: la risposta dice quante
+        errors.append({"line": None, "error": f"File non leggibile: {e}"})
+    finally:
+        text.detach()
+    return {"created": created, "failed": failed, "errors": errors}
+
+
+@router.post("/import/reminders")
+async def import_reminders(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Import di reminder da CSV (Content-Type: text/csv, con intestazione) o NDJSON.
+    Colonne: message, next_execution (senza offset = ora locale), recurrence_json,
+    status (opzionale). Gli altri campi (es. id di un export) vengono ignorati.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        fmt = "csv"
+    elif content_type in NDJSON_TYPES:
+        fmt = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Content-Type supportati: text/csv, application/x-ndjson")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="File troppo grande")
+            spool.write(chunk)
+        spool.seek(0)
+        result = await run_db(
+            _import_reminders, spool, fmt, current_user["id"], current_user.get("timezone", "Europe/Rome")
+        )
+    finally:
+        spool.close()
+    return ORJSONResponse(result)
@@ -0,0 +1,296 @@
+"""
+Parser del linguaggio naturale di /ricordami.
+
+Tutte le forme riconosciute (una tantum e ricorrenti "ogni …") sono regole di
+un'unica grammatica compilata all'import: un solo `match` sull'alternanza
+delle regole, nello stesso ordine di priorità, individua la regola (con
+`lastgroup`) e i suoi campi; l'handler della regola calcola la data.
+Aggiungere una forma significa aggiungere una riga a RULES.
+
+Ogni regola usa nomi di gruppo semplici (h, m, rest, …): in compilazione
+vengono prefissati con il nome della regola per renderli unici.
+"""
+
+import calendar
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytz
+from dateutil.relativedelta import relativedelta
+
+TZ = pytz.timezone("Europe/Rome")
+
+DAYS = {
+    'lunedì': 0, 'lunedi': 0,
+    'martedì': 1, 'martedi': 1,
+    'mercoledì': 2, 'mercoledi': 2,
+    'giovedì': 3, 'giovedi': 3,
+    'venerdì': 4, 'venerdi': 4,
+    'sabato': 5,
+    'domenica': 6,
+}
+MONTHS = {
+    'gennaio': 1, 'febbraio': 2, 'marzo': 3, 'aprile': 4,
+    'maggio': 5, 'giugno': 6, 'luglio': 7, 'agosto': 8,
+    'settembre': 9, 'ottobre': 10, 'novembre': 11, 'dicembre': 12,
+    'gen': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'mag': 5, 'giu': 6,
+    'lug': 7, 'ago': 8, 'set': 9, 'ott': 10, 'nov': 11, 'dic': 12,
+}
+# Fasce orarie senza ora esplicita (domani mattina, stasera, …)
+SLOT_HOURS = {'mattina': 9, 'pomeriggio': 15, 'sera': 21}
+
+# "ogni …" sceglie il messaggio di errore del comando quando nessuna regola corrisponde
+RECURRENCE_PREFIX = re.compile(r'ogni\b', re.IGNORECASE)
+
+_DAY_PAT = '|'.join(sorted(DAYS, key=len, reverse=True))
+_MONTH_PAT = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_TIME = r'(?P<h>\d{1,2})(?::(?P<m>\d{2}))?'
+_AT = rf'(?:\s+alle\s+{_TIME})?'
+_REST = r'\s*(?P<rest>.*)'
+_EVERY = r'ogni\s+'
+_DI_PREFIX = re.compile(r'di\s+', re.IGNORECASE)
+
+
+# ---------- Helper di calcolo ----------
+
+def _make_dt(year, month, day, hour, minute):
+    try:
+        return TZ.localize(datetime(year, month, day, hour, minute))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _parse_hm(h_str, m_str):
+    """(ora, minuti) se validi, altrimenti (None, None)."""
+    if h_str is None:
+        return None, None
+    h, m = int(h_str), int(m_str) if m_str else 0
+    return (h, m) if (0 <= h <= 23 and 0 <= m <= 59) else (None, None)
+
+
+def _hm_or(g, default_h, default_m=0):
+    """Ora esplicita se presente e valida, altrimenti quella di default."""
+    h, mn = _parse_hm(g["h"], g["m"])
+    return (default_h, default_m) if h is None else (h, mn)
+
+
+def _extract_msg(raw: str):
+    s = raw.strip()
+    if _DI_PREFIX.match(s):
+        s = s[s.index(' ') + 1:].strip()
+    return s if s else None
+
+
+def _on_day(now, days, h, mn):
+    base = now + timedelta(days=days)
+    return _make_dt(base.year, base.month, base.day, h, mn)
+
+
+def _next_weekday(now, target_dow, h, mn):
+    return _on_day(now, (target_dow - now.weekday()) % 7 or 7, h, mn)
+
+
+def _today_or_tomorrow(now, h, mn):
+    c = _make_dt(now.year, now.month, now.day, h, mn)
+    if c is None or c <= now:
+        c = _on_day(now, 1, h, mn)
+    return c
+
+
+def _next_dom(now, day, h, mn):
+    """Prossima occorrenza del giorno del mese."""
+    c = _make_dt(now.year, now.month, day, h, mn)
+    if c is None or c <= now:
+        nm = now + relativedelta(months=1)
+        c = _make_dt(nm.year, nm.month, day, h, mn)
+    return c
+
+
+def _last_dom(now, h, mn):
+    """Prossimo ultimo giorno del mese."""
+    last = calendar.monthrange(now.year, now.month)[1]
+    c = _make_dt(now.year, now.month, last, h, mn)
+    if c is None or c <= now:
+        nm = now + relativedelta(months=1)
+        last = calendar.monthrange(nm.year, nm.month)[1]
+        c = _make_dt(nm.year, nm.month, last, h, mn)
+    return c
+
+
+# ---------- Handler: (gruppi, now) → (datetime locale, ricorrenza) o None ----------
+
+def _at_day(days):
+    def handler(g, now):
+        h, mn = _parse_hm(g["h"], g["m"])
+        return (_on_day(now, days, h, mn), None) if h is not None else None
+    return handler
+
+
+def _at_slot(default_h):
+    def handler(g, now):
+        h, mn = _parse_hm(g["h"], g["m"]) if g["h"] else (default_h, 0)
+        return (_on_day(now, 0, h, mn), None) if h is not None else None
+    return handler
+
+
+def _tomorrow_slot(g, now):
+    h, mn = _parse_hm(g["h"], g["m"]) if g["h"] else (SLOT_HOURS[g["slot"].lower()], 0)
+    return (_on_day(now, 1, h, mn), None) if h is not None else None
+
+
+def _in_half_hour(g, now):
+    return now + timedelta(minutes=30), None
+
+
+def _in_amount(g, now):
+    n, unit = int(g["n"]), g["unit"].lower()
+    if unit.startswith('minut'):
+        return now + timedelta(minutes=n), None
+    if unit.startswith('or'):
+        return now + timedelta(hours=n), None
+    return now + timedelta(days=n), None
+
+
+def _weekday(g, now):
+    h, mn = _parse_hm(g["h"], g["m"])
+    if h is None:
+        return None
+    return _next_weekday(now, DAYS[g["dow"].lower()], h, mn), None
+
+
+def _date(g, now):
+    # Qui l'ora non passa da _parse_hm: un'ora fuori range rende la data non valida
+    day_n, month_n = int(g["day"]), MONTHS[g["month"].lower()]
+    year_n = int(g["year"]) if g["year"] else now.year
+    h = int(g["h"]) if g["h"] else 9
+    mn = int(g["m"]) if g["m"] else 0
+    candidate = _make_dt(year_n, month_n, day_n, h, mn)
+    if candidate and candidate < now and not g["year"]:
+        candidate = _make_dt(year_n + 1, month_n, day_n, h, mn)
+    return candidate, None
+
+
+def _every_days(g, now):
+    iv = int(g["iv"]) if g.get("iv") else 1
+    h, mn = _parse_hm(g["h"], g["m"])
+    if h is None or iv < 1:
+        return None
+    return _today_or_tomorrow(now, h, mn), {"type": "daily", "interval": iv}
+
+
+def _every_weekday(g, now):
+    h, mn = _parse_hm(g["h"], g["m"])
+    if h is None:
+        return None
+    return _next_weekday(now, DAYS[g["dow"].lower()], h, mn), {"type": "weekly", "interval": 1}
+
+
+def _every_week(g, now):
+    h, mn = _parse_hm(g["h"], g["m"])
+    if h is None:
+        return None
+    return _today_or_tomorrow(now, h, mn), {"type": "weekly", "interval": 1}
+
+
+def _every_month_start(g, now):
+    return _next_dom(now, 1, *_hm_or(g, 9)), {"type": "monthly", "interval": 1}
+
+
+def _every_month_end(g, now):
+    return _last_dom(now, *_hm_or(g, 9)), {"type": "monthly", "interval": 1}
+
+
+def _every_month_day(g, now):
+    iv = int(g["iv"]) if g.get("iv") else 1
+    day_n = int(g["day"]) if g["day"] else 1
+    if iv < 1 or not 1 <= day_n <= 31:
+        return None
+    return _next_dom(now, day_n, *_hm_or(g, 9)), {"type": "monthly", "interval": iv}
+
+
+def _every_year(g, now):
+    day_n = int(g["day"]) if g["day"] else now.day
+    month_n = MONTHS[g["month"].lower()] if g["month"] else now.month
+    h, mn = _hm_or(g, 9)
+    c = _make_dt(now.year, month_n, day_n, h, mn)
+    if c is None or c <= now:
+        c = _make_dt(now.year + 1, month_n, day_n, h, mn)
+    return c, {"type": "yearly", "interval": 1}
+
+
+# ---------- Grammatica ----------
+
+# (nome, pattern, handler) in ordine di priorità: a parità di prefisso vince la prima regola
+RULES = [
+    # Una tantum
+    ("domani_alle", rf'domani\s+alle\s+{_TIME}{_REST}', _at_day(1)),
+    ("oggi_alle", rf'oggi\s+alle\s+{_TIME}{_REST}', _at_day(0)),
+    ("dopodomani_alle", rf'dopodomani\s+alle\s+{_TIME}{_REST}', _at_day(2)),
+    ("domani_fascia", rf'domani\s+(?P<slot>mattina|pomeriggio|sera){_AT}{_REST}', _tomorrow_slot),
+    ("stasera", rf'stasera{_AT}{_REST}', _at_slot(21)),
+    ("oggi_pomeriggio", rf'oggi\s+pomeriggio{_AT}{_REST}', _at_slot(15)),
+    ("stamattina", rf'(?:stamattina|stamani){_AT}{_REST}', _at_slot(9)),
+    ("stanotte", rf'stanotte{_AT}{_REST}', _at_slot(23)),
+    ("tra_mezzora", rf"(?:tra|fra)\s+mezz'?ora{_REST}", _in_half_hour),
+    ("tra_quantita", rf'(?:tra|fra)\s+(?P<n>\d+)\s+(?P<unit>minut[oi]|or[ae]|giorn[oi]){_REST}', _in_amount),
+    ("giorno_settimana", rf'(?P<dow>{_DAY_PAT})\s+alle\s+{_TIME}{_REST}', _weekday),
+    ("data", rf'(?:il\s+)?(?P<day>\d{{1,2}})\s+(?P<month>{_MONTH_PAT})(?:\s+(?P<year>\d{{4}}))?{_AT}{_REST}', _date),
+    # Ricorrenti
+    ("ogni_giorno", rf'{_EVERY}giorno\s+alle\s+{_TIME}{_REST}', _every_days),
+    ("ogni_n_giorni", rf'{_EVERY}(?P<iv>\d+)\s+giorn[oi]\s+alle\s+{_TIME}{_REST}', _every_days),
+    ("ogni_giorno_settimana", rf'{_EVERY}(?P<dow>{_DAY_PAT})\s+alle\s+{_TIME}{_REST}', _every_weekday),
+    ("ogni_settimana_il", rf'{_EVERY}settimana\s+(?:il\s+)?(?P<dow>{_DAY_PAT})\s+alle\s+{_TIME}{_REST}',
+     _every_weekday),
+    ("ogni_settimana", rf'{_EVERY}settimana\s+alle\s+{_TIME}{_REST}', _every_week),
+    ("ogni_inizio_mese", rf'{_EVERY}inizio\s+mese{_AT}{_REST}', _every_month_start),
+    ("ogni_fine_mese", rf'{_EVERY}fine\s+mese{_AT}{_REST}', _every_month_end),
+    ("ogni_giorno_del_mese", rf'{_EVERY}(?P<day>\d{{1,2}})\s+del\s+mese{_AT}{_REST}', _every_month_day),
+    ("ogni_mese", rf'{_EVERY}mese(?:\s+il\s+(?P<day>\d{{1,2}}))?{_AT}{_REST}', _every_month_day),
+    ("ogni_n_mesi", rf'{_EVERY}(?P<iv>\d+)\s+mes[ei](?:\s+il\s+(?P<day>\d{{1,2}}))?{_AT}{_REST}',
+     _every_month_day),
+    ("ogni_anno", rf'{_EVERY}anno(?:\s+il\s+(?P<day>\d{{1,2}})\s+(?P<month>{_MONTH_PAT}))?{_AT}{_REST}',
+     _every_year),
+]
+
+
+def _compile(rules):
+    """
+    Un'unica regex: (?P<regola>pattern) | … con i gruppi interni prefissati.
+    Restituisce (regex, {regola: (handler, [(nome interno, nome breve)])}).
+    """
+    alternatives = []
+    table = {}
+    for name, pattern, handler in rules:
+        prefix = f"{name}__"
+        pattern = re.sub(r'\(\?P<(\w+)>', rf'(?P<{prefix}\1>', pattern)
+        groups = [(full, full[len(prefix):]) for full in re.compile(pattern).groupindex]
+        alternatives.append(f'(?P<{name}>{pattern})')
+        table[name] = (handler, groups)
+    return re.compile('|'.join(alternatives), re.IGNORECASE | re.DOTALL), table
+
+
+_GRAMMAR, _HANDLERS = _compile(RULES)
+
+
+def parse(text: str, now: datetime = None):
+    """
+    Interpreta il testo di /ricordami (una tantum o "ogni …").
+    Restituisce {"rule", "when" (datetime UTC), "recurrence" (dict o None),
+    "message"} oppure None se il testo non è riconosciuto.
+    """
+    m = _GRAMMAR.match(text)
+    if m is None:
+        return None
+    # lastgroup = il gruppo esterno della regola, l'ultimo a chiudersi
+    handler, groups = _HANDLERS[m.lastgroup]
+    g = {short: m.group(full) for full, short in groups}
+    if now is None:
+        now = datetime.now(TZ)
+    result = handler(g, now)
+    if result is None or result[0] is None:
+        return None
+    dt, recurrence = result
+    msg = _extract_msg(g["rest"])
+    if not msg:
+        return None
+    return {"rule": m.lastgroup, "when": dt.astimezone(timezone.utc), "recurrence": recurrence, "message": msg}
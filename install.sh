@@ -168,6 +168,7 @@ ExecStart=${INSTALL_DIR}/.venv/bin/python -m uvicorn backend.main:app \\
     --host 0.0.0.0 \\
     --port ${APP_PORT} \\
     --no-access-log \\
+    --timeout-graceful-shutdown 5 \\
     --log-level warning
 Restart=always
 RestartSec=5
@@ -1,5 +1,18 @@
+"""
+Backup online del database con l'API di backup SQLite.
+
+La copia avviene a passi di `backup_pages_per_step` pagine con una breve pausa
+tra un passo e l'altro: scheduler e web continuano a scrivere durante il backup
+e il risultato include anche le pagine ancora nel file -wal (a differenza di
+una copia del file). La copia viene verificata con `PRAGMA integrity_check`,
+compressa con gzip e solo allora pubblicata come reminder_YYYYMMDD_HHMMSS.db.gz.
+"""
+
+import gzip
 import shutil
+import sqlite3
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -7,6 +20,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 import yaml
+from backend.database import DB_PATH
 from scheduler.log_manager import get_logger, db_log
 
 logger = get_logger("scheduler.backup")
@@ -15,34 +29,135 @@ CONFIG_PATH = BASE_DIR / "config.yaml"
 with open(CONFIG_PATH, "r") as f:
     CONFIG = yaml.safe_load(f)
 
-DB_PATH = BASE_DIR / CONFIG.get("db_path", "data/reminder.db")
 BACKUP_DIR = BASE_DIR / CONFIG.get("backup_path", "data/backups")
 BACKUP_KEEP = CONFIG.get("backup_keep", 7)
+PAGES_PER_STEP = max(int(CONFIG.get("backup_pages_per_step", 1024)), 1)
+STEP_SLEEP_SEC = CONFIG.get("backup_step_sleep_sec", 0.01)
+COMPRESS_LEVEL = CONFIG.get("backup_compress_level", 6)
+
+# Se il DB cambia da un'altra connessione durante la copia a passi, SQLite la
+# ricomincia da capo: dopo MAX_RESTARTS ripartenze si copia in un passo solo
+# (in WAL tiene solo un lock di lettura, gli scrittori non si fermano).
+MAX_RESTARTS = 3
+
+_last_backup = {}
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy_online(dest: Path) -> dict:
+    """Copia il DB live in `dest` con l'API di backup. Restituisce pagine e ripartenze."""
+    stats = {"pages": 0, "restarts": 0}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats["pages"] = total
+        # Dopo una ripartenza `remaining` non scende (torna al valore del primo passo)
+        if last_remaining is not None and remaining >= last_remaining:
+            stats["restarts"] += 1
+            if stats["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if remaining:
+            time.sleep(STEP_SLEEP_SEC)
+
+    src = sqlite3.connect(DB_PATH, timeout=5)
+    try:
+        # Con molte pagine ancora nel -wal la copia a passi riparte a ogni passo:
+        # un checkpoint PASSIVE (non attende né blocca gli scrittori) lo svuota prima
+        src.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        for pages in (PAGES_PER_STEP, -1):
+            dst = sqlite3.connect(dest)
+            try:
+                src.backup(dst, pages=pages, progress=progress)
+                result = dst.execute("PRAGMA integrity_check").fetchone()[0]
+                if result != "ok":
+                    raise RuntimeError(f"integrity_check fallito: {result}")
+                return stats
+            except _TooManyRestarts:
+                logger.warning("Backup a passi ricominciato troppe volte, copia in un passo unico")
+                last_remaining = None
+            finally:
+                dst.close()
+    finally:
+        src.close()
+    raise RuntimeError("backup non completato")
+
+
+def _compress(src: Path, dest: Path):
+    with open(src, "rb") as f_in, gzip.open(dest, "wb", compresslevel=COMPRESS_LEVEL) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def _prune_old_backups():
+    """Mantiene solo gli ultimi BACKUP_KEEP backup (anche quelli .db non compressi)."""
+    backups = sorted(
+        list(BACKUP_DIR.glob("reminder_*.db.gz")) + list(BACKUP_DIR.glob("reminder_*.db")),
+        key=lambda p: p.stat().st_mtime,
+    )
+    while len(backups) > BACKUP_KEEP:
+        oldest = backups.pop(0)
+        oldest.unlink()
+        logger.info(f"Backup rimosso: {oldest}")
 
 
 def run_backup():
-    """Esegue il backup del database e mantiene solo gli ultimi BACKUP_KEEP backup."""
+    """Esegue il backup online del database e mantiene solo gli ultimi BACKUP_KEEP backup."""
+    tmp = partial = None
     try:
         BACKUP_DIR.mkdir(parents=True, exist_ok=True)
 
-        if not DB_PATH.exists():
+        if not Path(DB_PATH).exists():
             logger.warning("Database non trovato, skip backup")
             return
 
+        start = time.monotonic()
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        dest = BACKUP_DIR / f"reminder_{timestamp}.db"
-        shutil.copy2(str(DB_PATH), str(dest))
-        logger.info(f"Backup creato: {dest}")
-        db_log("INFO", f"Backup creato: {dest.name}")
-
-        # Mantieni solo gli ultimi BACKUP_KEEP backup
-        backups = sorted(BACKUP_DIR.glob("reminder_*.db"), key=lambda p: p.stat().st_mtime)
-        while len(backups) > BACKUP_KEEP:
-            oldest = backups.pop(0)
-            oldest.unlink()
-            logger.info(f"Backup rimosso: {oldest}")
+        tmp = BACKUP_DIR / f".reminder_{timestamp}.db.tmp"
+        dest = BACKUP_DIR / f"reminder_{timestamp}.db.gz"
+        partial = dest.with_name(dest.name + ".part")
+
+        stats = _copy_online(tmp)
+        copy_sec = time.monotonic() - start
+        db_size = tmp.stat().st_size
+
+        # Scrive su file temporaneo e rinomina: un backup visibile è sempre completo
+        _compress(tmp, partial)
+        partial.replace(dest)
+
+        _last_backup.update({
+            "file": dest.name,
+            "created_at": timestamp,
+            "duration_sec": round(time.monotonic() - start, 3),
+            "copy_sec": round(copy_sec, 3),
+            "db_bytes": db_size,
+            "compressed_bytes": dest.stat().st_size,
+            "pages": stats["pages"],
+            "restarts": stats["restarts"],
+        })
+        logger.info(
+            f"Backup creato: {dest} ({db_size} → {_last_backup['compressed_bytes']} byte, "
+            f"{_last_backup['duration_sec']}s, ripartenze: {stats['restarts']})"
+        )
+        db_log(
+            "INFO",
+            f"Backup creato: {dest.name} ({_last_backup['compressed_bytes']} byte, {_last_backup['duration_sec']}s)",
+        )
+
+        _prune_old_backups()
 
     except Exception as e:
         logger.error(f"Errore durante backup: {e}")
         db_log("ERROR", f"Errore backup: {e}")
+    finally:
+        for path in (tmp, partial):
+            if path is not None and path.exists():
+                path.unlink()
+
 
+def get_backup_stats() -> dict:
+    """Metriche dell'ultimo backup riuscito (vuoto se non ancora eseguito)."""
+    return dict(_last_backup)
@@ -0,0 +1,155 @@
+"""
+Pianificazione degli invii: previsione del carico e smussamento dei picchi.
+
+Molti reminder scadono a orari tondi (ogni giorno alle 9, inizio mese…):
+centinaia di messaggi nello stesso istante per ogni chat, che il limite
+Telegram per chat (telegram_chat_rate, ~1 msg/s) smaltisce in minuti.
+
+Con delivery_smoothing_window_sec > 0 il dispatcher prende i reminder fino
+a quella finestra in anticipo e l'outbox li invia distribuiti all'indietro
+dalla scadenza (stage_sends): l'ultimo messaggio di un picco esce in orario
+invece che minuti dopo. Con 0 (default) gli invii partono alla scadenza.
+
+La previsione (forecast) conta le occorrenze materializzate per minuto
+(tabella occurrences, aggregata in SQL) e simula la coda di invio con e
+senza smussamento per stimare i ritardi. I reminder espansi solo fino al
+limite per reminder (occurrences_truncated) proseguono in forma chiusa se a
+passo fisso; altrimenti la previsione è segnata come parziale.
+"""
+
+import sys
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from backend.database import get_connection
+from scheduler.outbox import GLOBAL_RATE, CHAT_RATE
+from scheduler.recurrence import FIXED_STEPS, compile_recurrence
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+SMOOTHING_WINDOW_SEC = max(CONFIG.get("delivery_smoothing_window_sec", 0), 0)
+FORECAST_PEAKS = 10
+
+
+def chat_rate(n_chats: int) -> float:
+    """Messaggi al secondo smaltibili per ciascuna chat (limite per chat e globale)."""
+    return min(CHAT_RATE, GLOBAL_RATE / max(n_chats, 1))
+
+
+def stage_sends(items: list, now: float, rate: float, window: float = SMOOTHING_WINDOW_SEC) -> dict:
+    """
+    Orari di invio per una lista di (reminder_id, scadenza epoch).
+
+    All'indietro dalla scadenza più lontana: ogni messaggio esce entro la
+    propria scadenza e almeno 1/rate secondi prima del successivo, mai prima
+    di `window` secondi dalla scadenza né prima di adesso. Quello che non
+    entra nella finestra esce in ritardo, al ritmo dei token bucket
+    dell'outbox. Con window = 0 tutti gli orari sono max(scadenza, adesso).
+    Restituisce {reminder_id: epoch di invio}.
+    """
+    gap = 1 / rate
+    slot = float("inf")
+    out = {}
+    for reminder_id, due in sorted(items, key=lambda item: item[1], reverse=True):
+        slot = min(due, slot - gap)
+        out[reminder_id] = max(slot, due - window, now)
+    return out
+
+
+def simulate(buckets: list, rate: float, window: float) -> tuple:
+    """
+    Coda di invio per chat su [(epoch del minuto, messaggi)] ordinati.
+    I messaggi di un minuto sono dovuti al suo inizio (orari tondi) e possono
+    partire fino a `window` secondi prima. Restituisce (ritardo massimo per
+    minuto, p99 dei ritardi di tutti i messaggi) in secondi.
+    """
+    gap = 1 / rate
+    free_at = float("-inf")
+    worst, delays = [], []
+    for minute, count in buckets:
+        # All'indietro dalla scadenza: l'ultimo esce alla scadenza se la finestra basta
+        start = max(minute - min(window, (count - 1) * gap), free_at)
+        free_at = start + count * gap
+        bucket_delays = [max(start + i * gap - minute, 0.0) for i in range(count)]
+        worst.append(bucket_delays[-1])
+        delays += bucket_delays
+    if not delays:
+        return worst, 0.0
+    delays.sort()
+    return worst, delays[min(len(delays) - 1, int(len(delays) * 0.99))]
+
+
+def _truncated_tails(conn, start_epoch: int, end_epoch: int) -> tuple:
+    """
+    ({epoch del minuto: occorrenze}, parziale) per le occorrenze in [start, end)
+    oltre l'ultima materializzata dei reminder troncati. Passo fisso: serie
+    aritmetica da until_epoch, calcolata una volta per (primo, passo) comune.
+    """
+    series = Counter()
+    partial = False
+    for row in conn.execute(
+        """SELECT t.until_epoch, r.recurrence_json FROM occurrences_truncated t
+           JOIN reminders r ON r.id = t.reminder_id
+           WHERE t.until_epoch < ?""",
+        (end_epoch,),
+    ):
+        recurrence = compile_recurrence(row["recurrence_json"])
+        if recurrence is None or recurrence.type not in FIXED_STEPS:
+            partial = True
+            continue
+        step = int((FIXED_STEPS[recurrence.type] * recurrence.interval).total_seconds())
+        first = row["until_epoch"] + step
+        if first < start_epoch:
+            first += -(-(start_epoch - first) // step) * step
+        series[(first, step)] += 1
+    counts = Counter()
+    for (first, step), n in series.items():
+        for epoch in range(first, end_epoch, step):
+            counts[epoch // 60 * 60] += n
+    return counts, partial
+
+
+def forecast(start_epoch: int, end_epoch: int, n_chats: int, window: float = SMOOTHING_WINDOW_SEC) -> dict:
+    """
+    Invii previsti per minuto in [start, end) (tutti gli utenti: i limiti
+    Telegram sono del bot) e ritardi stimati senza e con smussamento.
+    `partial` = mancano le occorrenze oltre il limite per reminder di
+    ricorrenze non a passo fisso.
+    """
+    conn = get_connection()
+    rows = conn.execute(
+        """SELECT occurs_epoch / 60 * 60 AS minute, COUNT(*) AS n FROM occurrences
+           WHERE occurs_epoch >= ? AND occurs_epoch < ?
+           GROUP BY minute ORDER BY minute""",
+        (start_epoch, end_epoch),
+    ).fetchall()
+    tails, partial = _truncated_tails(conn, start_epoch, end_epoch)
+    conn.close()
+
+    counts = Counter({row["minute"]: row["n"] for row in rows})
+    counts.update(tails)
+    buckets = sorted(counts.items())
+    rate = chat_rate(n_chats)
+    on_time, p99_on_time = simulate(buckets, rate, 0)
+    smoothed, p99_smoothed = simulate(buckets, rate, window)
+    minutes = [
+        {"minute": minute, "reminders": count, "messages": count * n_chats,
+         "max_delay_sec": round(late, 1), "max_delay_smoothed_sec": round(late_s, 1)}
+        for (minute, count), late, late_s in zip(buckets, on_time, smoothed)
+    ]
+    return {
+        "chat_rate": rate,
+        "smoothing_window_sec": window,
+        "total_reminders": sum(count for _, count in buckets),
+        "partial": partial,
+        "p99_delay_sec": round(p99_on_time, 1),
+        "p99_delay_smoothed_sec": round(p99_smoothed, 1),
+        "peaks": sorted(minutes, key=lambda m: (-m["reminders"], m["minute"]))[:FORECAST_PEAKS],
+        "minutes": minutes,
+    }
@@ -0,0 +1,150 @@
+"""
+Coda in memoria dei reminder in scadenza (min-heap su next_execution_epoch).
+
+Il dispatcher dorme esattamente fino al prossimo reminder dovuto invece di
+interrogare il DB a intervalli fissi. Router, bot e job dello scheduler
+aggiornano la coda a ogni create/update/delete; un resync periodico dal DB
+copre eventuali modifiche fatte fuori dal processo.
+"""
+
+import heapq
+import sys
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from backend.database import get_connection, to_epoch
+from scheduler.log_manager import get_logger
+
+logger = get_logger("scheduler.due_queue")
+
+# Heap di (epoch, reminder_id). Le voci superate restano nell'heap e vengono
+# scartate al pop confrontandole con _entries (lazy deletion).
+_heap = []
+_entries = {}
+_cond = threading.Condition()
+
+
+def _to_epoch(value):
+    """Epoch UTC di un datetime/stringa ISO/intero, None se non interpretabile."""
+    if value is None:
+        return None
+    try:
+        return to_epoch(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_schedulable(reminder) -> bool:
+    """Stesso criterio di check_and_send_reminders: pending o 'sent' ricorrente, non eliminato."""
+    if reminder["deleted_at"]:
+        return False
+    if reminder["status"] == "pending":
+        return True
+    rec = reminder["recurrence_json"]
+    return reminder["status"] == "sent" and rec not in (None, "", "null")
+
+
+def schedule_reminder(reminder_id: int, when):
+    """Inserisce o sposta un reminder nella coda alla data `when`."""
+    epoch = _to_epoch(when)
+    if epoch is None:
+        cancel_reminder(reminder_id)
+        return
+    with _cond:
+        if _entries.get(reminder_id) == epoch:
+            return
+        _entries[reminder_id] = epoch
+        heapq.heappush(_heap, (epoch, reminder_id))
+        # Sveglia il dispatcher solo se la nuova voce è la prima in coda
+        if _heap[0] == (epoch, reminder_id):
+            _cond.notify()
+
+
+def cancel_reminder(reminder_id: int):
+    """Rimuove un reminder dalla coda (la voce nell'heap viene scartata al pop)."""
+    with _cond:
+        _entries.pop(reminder_id, None)
+
+
+def sync_reminder(reminder):
+    """Allinea la coda allo stato corrente di una riga reminders (dict o sqlite3.Row)."""
+    if reminder is None:
+        return
+    if _is_schedulable(reminder):
+        schedule_reminder(reminder["id"], reminder["next_execution_epoch"])
+    else:
+        cancel_reminder(reminder["id"])
+
+
+def load_from_db():
+    """Ricostruisce la coda leggendo i reminder schedulabili dal DB."""
+    conn = get_connection()
+    rows = conn.execute(
+        """SELECT id, next_execution_epoch, status, recurrence_json, deleted_at
+           FROM reminders
+           WHERE deleted_at IS NULL AND status IN ('pending', 'sent')"""
+    ).fetchall()
+    conn.close()
+
+    entries = {}
+    for row in rows:
+        if _is_schedulable(row):
+            epoch = row["next_execution_epoch"]
+            if epoch is not None:
+                entries[row["id"]] = epoch
+
+    with _cond:
+        _entries.clear()
+        _entries.update(entries)
+        _heap[:] = [(epoch, rid) for rid, epoch in entries.items()]
+        heapq.heapify(_heap)
+        _cond.notify()
+    logger.debug(f"Coda scadenze ricaricata: {len(entries)} reminder")
+
+
+def _pop_due(now: float) -> list:
+    """Estrae gli ID dovuti entro `now`. Da chiamare con _cond acquisito."""
+    due = []
+    while _heap and _heap[0][0] <= now:
+        epoch, rid = heapq.heappop(_heap)
+        if _entries.get(rid) == epoch:
+            del _entries[rid]
+            due.append(rid)
+    return due
+
+
+def _seconds_until_next(now: float):
+    """Secondi al prossimo reminder valido (None se la coda è vuota)."""
+    while _heap and _entries.get(_heap[0][1]) != _heap[0][0]:
+        heapq.heappop(_heap)
+    if not _heap:
+        return None
+    return max(_heap[0][0] - now, 0.0)
+
+
+def run_dispatcher(callback, max_sleep: float = 300, lead: float = 0):
+    """
+    Loop del dispatcher (blocca il thread): attende il prossimo reminder
+    dovuto e invoca `callback()`. Il callback è responsabile di rimettere
+    in coda i reminder ancora da inviare (ricorrenze, retry). Con `lead` > 0
+    i reminder sono dovuti `lead` secondi prima della scadenza (smussamento
+    dei picchi, vedi scheduler/delivery_plan.py).
+    """
+    logger.info("Dispatcher scadenze avviato")
+    while True:
+        with _cond:
+            delay = _seconds_until_next(time.time() + lead)
+            if delay is None or delay > 0:
+                _cond.wait(min(delay if delay is not None else max_sleep, max_sleep))
+                continue
+            due = _pop_due(time.time() + lead)
+        if not due:
+            continue
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Errore dispatcher scadenze: {e}")
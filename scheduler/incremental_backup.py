@@ -0,0 +1,307 @@
+"""
+Backup incrementale: snapshot base periodico + delta delle pagine cambiate.
+
+Ogni `incremental_interval_sec` secondi si leggono dal -wal soltanto i frame
+aggiunti dall'ultimo giro (validati con il checksum del formato WAL, fino
+all'ultimo commit) e si scrivono le pagine che contengono: niente lettura
+dell'intero DB. Se nel frattempo il -wal è ricominciato dopo un checkpoint i
+frame non letti sono persi: solo allora si legge un'immagine consistente del
+DB (Connection.serialize) e si confronta l'hash di ogni pagina con quello
+noto. Ogni `incremental_base_hours` ore (e a ogni avvio del processo) inizia
+una nuova catena con un'immagine completa.
+
+    data/backups/incremental/<base>/<timestamp>.delta.gz
+
+Il primo file di una catena contiene tutte le pagine. Il restore
+point-in-time (scheduler/restore.py) applica in ordine i file di una catena
+fino al timestamp richiesto.
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from backend.database import DB_PATH
+from scheduler.backup import BACKUP_DIR
+from scheduler.log_manager import get_logger, db_log
+
+logger = get_logger("scheduler.incremental_backup")
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+INCREMENTAL_DIR = BACKUP_DIR / "incremental"
+INTERVAL_SEC = CONFIG.get("incremental_interval_sec", 30)
+BASE_HOURS = CONFIG.get("incremental_base_hours", 24)
+KEEP_CHAINS = max(int(CONFIG.get("incremental_keep_chains", 7)), 1)
+COMPRESS_LEVEL = CONFIG.get("backup_compress_level", 6)
+
+# Formato file: header + n record (numero pagina 1-based, contenuto pagina)
+MAGIC = b"RMDELTA1"
+HEADER = struct.Struct(">8sIIdI")  # magic, page_size, page_count, timestamp, n_pages
+PAGE_NO = struct.Struct(">I")
+STAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+# Formato -wal di SQLite: header di 32 byte, frame = header di 24 byte + pagina.
+# Il magic indica l'ordine dei byte delle parole su cui si calcola il checksum
+WAL_MAGIC_LE, WAL_MAGIC_BE = 0x377F0682, 0x377F0683
+WAL_HEADER = struct.Struct(">8I")  # magic, versione, page_size, seq. checkpoint, salt1, salt2, checksum
+WAL_FRAME = struct.Struct(">6I")   # pgno, page_count se commit (0 altrimenti), salt1, salt2, checksum
+
+_lock = threading.Lock()
+# Stato dell'ultimo giro: valido solo per la vita del processo, al riavvio
+# si riparte da una nuova base (il DB può essere cambiato nel frattempo)
+# "wal": posizione nel -wal dopo l'ultimo commit spedito (vedi _wal_scan)
+_state = {"chain": None, "base_at": 0.0, "page_size": 0, "hashes": [], "wal": None}
+
+
+def stamp(ts: float) -> str:
+    """Timestamp UTC usato nei nomi dei file (ordinabile come stringa)."""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(STAMP_FORMAT)
+
+
+def parse_stamp(name: str) -> float:
+    return datetime.strptime(name, STAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _page_hash(page) -> bytes:
+    return hashlib.blake2b(page, digest_size=16).digest()
+
+
+def _snapshot():
+    """Immagine consistente del DB: (page_size, bytes)."""
+    src = sqlite3.connect(DB_PATH, timeout=5)
+    try:
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        data = src.serialize()
+    finally:
+        src.close()
+    return page_size, data
+
+
+def _wal_checksum(data, s0: int, s1: int, swap: bool) -> tuple:
+    """Checksum cumulativo del formato WAL su `data` (multiplo di 8 byte)."""
+    words = array("I")
+    words.frombytes(data)
+    if swap:
+        words.byteswap()
+    it = iter(words)
+    for a, b in zip(it, it):
+        s0 = (s0 + a + s1) & 0xFFFFFFFF
+        s1 = (s1 + b + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def _db_stat() -> tuple:
+    st = os.stat(DB_PATH)
+    return st.st_size, st.st_mtime_ns
+
+
+def _wal_scan(position):
+    """
+    Frame confermati del -wal successivi a `position`.
+
+    position = (salt, frame, s0, s1, stat del DB) subito dopo l'ultimo commit
+    letto; None = dall'inizio del -wal corrente. Restituisce (nuova position,
+    page_size, {pgno: pagina}, page_count dell'ultimo commit o None se non ce
+    ne sono di nuovi), oppure None se dei frame successivi a `position`
+    possono essere andati persi (-wal ricominciato, salt diverso): in quel
+    caso serve il confronto completo.
+    """
+    db_stat = _db_stat()
+    try:
+        with open(str(DB_PATH) + "-wal", "rb") as f:
+            raw = f.read(WAL_HEADER.size)
+            header = WAL_HEADER.unpack(raw) if len(raw) == WAL_HEADER.size else None
+            if header is None or header[0] not in (WAL_MAGIC_LE, WAL_MAGIC_BE):
+                raise FileNotFoundError
+            magic, _, page_size, _, salt1, salt2, c0, c1 = header
+            swap = (magic == WAL_MAGIC_BE) != (sys.byteorder == "big")
+            if _wal_checksum(raw[:24], 0, 0, swap) != (c0, c1):
+                raise FileNotFoundError
+            salt = (salt1, salt2)
+            if position is None:
+                position = (salt, 0, c0, c1, db_stat)
+            elif position[0] is None and position[4] == db_stat:
+                # -wal vuoto al giro prima e DB non toccato da checkpoint: generazione nuova
+                position = (salt, 0, c0, c1, db_stat)
+            elif position[0] != salt:
+                return None
+
+            _, index, s0, s1, _ = position
+            frame_size = WAL_FRAME.size + page_size
+            f.seek(WAL_HEADER.size + index * frame_size)
+            pages, pending, page_count = {}, {}, None
+            while True:
+                frame = f.read(frame_size)
+                if len(frame) < frame_size:
+                    break
+                pgno, commit, fs1, fs2, k0, k1 = WAL_FRAME.unpack_from(frame)
+                if (fs1, fs2) != salt:
+                    break  # frame di una generazione precedente del -wal
+                s0, s1 = _wal_checksum(frame[:8], s0, s1, swap)
+                s0, s1 = _wal_checksum(memoryview(frame)[WAL_FRAME.size:], s0, s1, swap)
+                if (s0, s1) != (k0, k1):
+                    break  # frame in scrittura o non valido
+                index += 1
+                pending[pgno] = frame[WAL_FRAME.size:]
+                if commit:
+                    pages.update(pending)
+                    pending.clear()
+                    page_count = commit
+                    position = (salt, index, s0, s1, db_stat)
+            return position, page_size, pages, page_count
+    except FileNotFoundError:
+        # Niente -wal (o vuoto): le modifiche sono tutte nel file del DB
+        if position is not None and (position[0] is not None or position[4] != db_stat):
+            return None
+        return (None, 0, 0, 0, db_stat), None, {}, None
+
+
+def _write_delta(path: Path, page_size: int, page_count: int, ts: float, pages: list):
+    """Scrive le pagine [(pgno 1-based, contenuto)] su file gzip, pubblicato via rename."""
+    partial = path.with_name(path.name + ".part")
+    with gzip.open(partial, "wb", compresslevel=COMPRESS_LEVEL) as f:
+        f.write(HEADER.pack(MAGIC, page_size, page_count, ts, len(pages)))
+        for pgno, page in pages:
+            f.write(PAGE_NO.pack(pgno))
+            f.write(page)
+    partial.replace(path)
+
+
+def read_delta(path: Path):
+    """Legge un file delta: (page_size, page_count, timestamp, iteratore di (pgno, pagina))."""
+    f = gzip.open(path, "rb")
+    magic, page_size, page_count, ts, n_pages = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        f.close()
+        raise ValueError(f"{path.name}: formato non riconosciuto")
+
+    def pages():
+        with f:
+            for _ in range(n_pages):
+                (pgno,) = PAGE_NO.unpack(f.read(PAGE_NO.size))
+                yield pgno, f.read(page_size)
+
+    return page_size, page_count, ts, pages()
+
+
+def list_chains() -> list:
+    """Catene disponibili, dalla più vecchia: [(dir, [file delta ordinati])]."""
+    if not INCREMENTAL_DIR.exists():
+        return []
+    chains = []
+    for chain in sorted(p for p in INCREMENTAL_DIR.iterdir() if p.is_dir()):
+        deltas = sorted(chain.glob("*.delta.gz"))
+        if deltas:
+            chains.append((chain, deltas))
+    return chains
+
+
+def _prune_chains():
+    """Mantiene le ultime KEEP_CHAINS catene (finestra di restore point-in-time)."""
+    chains = sorted(p for p in INCREMENTAL_DIR.iterdir() if p.is_dir())
+    for chain in chains[:-KEEP_CHAINS]:
+        shutil.rmtree(chain)
+        logger.info(f"Catena incrementale rimossa: {chain.name}")
+
+
+def _ship_wal(chain: Path, now: float, scan) -> int:
+    """Delta con le pagine dei frame confermati letti dal -wal; restituisce quante."""
+    position, _, pages, page_count = scan
+    _state["wal"] = position
+    if page_count is None:
+        return 0
+    changed = sorted(pgno for pgno in pages if pgno <= page_count)
+    _write_delta(chain / f"{stamp(now)}.delta.gz", _state["page_size"], page_count, now,
+                 [(pgno, pages[pgno]) for pgno in changed])
+    hashes = _state["hashes"][:page_count]
+    hashes += [b""] * (page_count - len(hashes))
+    for pgno in changed:
+        hashes[pgno - 1] = _page_hash(pages[pgno])
+    _state["hashes"] = hashes
+    return len(changed)
+
+
+def _ship_compare(chain: Path, now: float, new_chain: bool) -> tuple:
+    """
+    Immagine completa del DB confrontata pagina per pagina con gli hash noti
+    (tutte le pagine se new_chain). Restituisce (pagine scritte, pagine totali).
+    """
+    # Posizione nel -wal letta prima dell'immagine: i commit successivi sono
+    # già nell'immagine e verranno rispediti al prossimo giro (innocuo)
+    scan = _wal_scan(None)
+    page_size, data = _snapshot()
+    image = memoryview(data)
+    page_count = len(data) // page_size
+    hashes = [_page_hash(image[i * page_size:(i + 1) * page_size]) for i in range(page_count)]
+    if new_chain:
+        changed = list(range(page_count))
+    else:
+        old = _state["hashes"]
+        changed = [i for i, h in enumerate(hashes) if i >= len(old) or old[i] != h]
+    if changed or page_count != len(_state["hashes"]):
+        _write_delta(chain / f"{stamp(now)}.delta.gz", page_size, page_count, now,
+                     [(i + 1, image[i * page_size:(i + 1) * page_size]) for i in changed])
+    _state.update({"page_size": page_size, "hashes": hashes, "wal": scan[0] if scan else None})
+    return len(changed), page_count
+
+
+def run_incremental_backup():
+    """Job periodico: spedisce le pagine cambiate dall'ultimo giro (o una nuova base)."""
+    if not _lock.acquire(blocking=False):
+        return
+    try:
+        if not Path(DB_PATH).exists():
+            return
+        start = time.monotonic()
+        now = time.time()
+        new_chain = (
+            _state["chain"] is None
+            or now - _state["base_at"] >= BASE_HOURS * 3600
+            or not _state["chain"].exists()
+        )
+        if new_chain:
+            chain = INCREMENTAL_DIR / stamp(now)
+            chain.mkdir(parents=True, exist_ok=True)
+            _, page_count = _ship_compare(chain, now, True)
+            _state.update({"chain": chain, "base_at": now})
+            _prune_chains()
+            logger.info(f"Nuova base incrementale {chain.name}: {page_count} pagine")
+            db_log("INFO", f"Backup incrementale: nuova base {chain.name}")
+            return
+
+        chain = _state["chain"]
+        scan = _wal_scan(_state["wal"])
+        if scan is not None and scan[1] in (None, _state["page_size"]):
+            changed = _ship_wal(chain, now, scan)
+            source = "wal"
+        else:
+            changed, _ = _ship_compare(chain, now, False)
+            source = "confronto completo"
+        if changed:
+            logger.debug(
+                f"Delta incrementale ({source}): {changed}/{len(_state['hashes'])} pagine, "
+                f"{time.monotonic() - start:.2f}s"
+            )
+    except Exception as e:
+        # Dopo un errore si riparte da una base nuova: la catena potrebbe avere un buco
+        _state["chain"] = None
+        logger.error(f"Errore backup incrementale: {e}")
+        db_log("ERROR", f"Errore backup incrementale: {e}")
+    finally:
+        _lock.release()
@@ -1,4 +1,3 @@
-import json
 import sys
 import threading
 from pathlib import Path
@@ -7,8 +6,13 @@ from datetime import datetime, timezone, timedelta
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from backend.database import get_connection
-from scheduler.log_manager import get_logger, db_log
+from backend.database import get_connection, to_utc_str, to_epoch
+from backend import events
+from scheduler.log_manager import get_logger, db_log, db_log_many
+from scheduler.due_queue import schedule_reminder, cancel_reminder
+from scheduler.outbox import enqueue_many, wake
+from scheduler.recurrence import FIXED_STEPS, compile_recurrence, parse_original
+from scheduler.delivery_plan import SMOOTHING_WINDOW_SEC, chat_rate, stage_sends
 
 logger = get_logger("scheduler.jobs")
 
@@ -20,80 +24,89 @@ with open(CONFIG_PATH, "r") as f:
 TELEGRAM_TOKEN = CONFIG.get("telegram_token", "")  # fallback legacy, non usato
 # CHAT_IDS caricati dinamicamente dal DB via _get_telegram_config()
 
+# Attesa prima di riprovare se non ci sono chat_ids configurati (minimo 10s)
+RETRY_DELAY_SEC = max(CONFIG.get("scheduler_interval_sec", 5), 10)
+
+# Righe per singolo INSERT multi-VALUES (2 parametri a riga, limite SQLite 999)
+RESERVE_CHUNK = 400
+
 # Lock per evitare esecuzioni parallele del job principale
 _send_lock = threading.Lock()
 
 
 def _get_telegram_config():
-    """Ricarica la config Telegram dal DB a ogni chiamata (hot-reload dalla UI)."""
+    """Config Telegram dalla cache di backend.database (invalidata dalla UI → hot-reload)."""
     from backend.database import get_telegram_config
     return get_telegram_config()
 
 
+def _max_lead(reminder) -> float:
+    """
+    Anticipo massimo con cui il reminder può essere preso in carico: la
+    finestra di smussamento, ma non oltre un passo della ricorrenza. Con
+    un anticipo maggiore la presa dell'occorrenza successiva arriverebbe
+    prima che l'outbox abbia inviato quella precedente.
+    """
+    recurrence = compile_recurrence(reminder["recurrence_json"])
+    if recurrence is not None and recurrence.type in FIXED_STEPS:
+        step = FIXED_STEPS[recurrence.type] * recurrence.interval
+        return min(SMOOTHING_WINDOW_SEC, step.total_seconds())
+    return SMOOTHING_WINDOW_SEC
+
+
 def _utc_now_str() -> str:
     """Restituisce il timestamp UTC corrente in formato ISO senza offset (per SQLite)."""
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
 
 
-def _send_telegram_sync(chat_id: int, text: str, execution_id: int) -> bool:
-    """Invia messaggio Telegram con pulsante di conferma (sincrono)."""
-    try:
-        cfg = _get_telegram_config()
-        token = cfg["telegram_token"]
-        if not token:
-            logger.warning("Token Telegram non configurato")
-            return False
-        import requests as req_lib
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        payload = {
-            "chat_id": chat_id,
-            "text": f"🔔 {text}",
-            "parse_mode": "HTML",
-            "reply_markup": json.dumps({
-                "inline_keyboard": [[
-                    {"text": "✔ Confermato", "callback_data": f"confirm:{execution_id}"}
-                ]]
-            }),
-        }
-        r = req_lib.post(url, json=payload, timeout=5)
-        return r.status_code == 200
-    except Exception as e:
-        logger.error(f"Errore invio Telegram a {chat_id}: {e}")
-        return False
+def _reserve_executions(conn, items: list, chat_ids: list, send_at: dict = None) -> dict:
+    """
+    Crea in blocco le executions per una lista di (reminder_id, text) e accoda
+    i messaggi nell'outbox per ogni chat, nella transazione del chiamante
+    (`send_at`: {reminder_id: epoch} per gli invii pianificati più avanti).
+    Restituisce {reminder_id: execution_id}. L'invio vero lo fa il worker outbox:
+    se il processo cade prima del commit non resta nulla, dopo il commit
+    l'outbox garantisce la consegna.
+    """
+    if not items:
+        return {}
+    sent_at = _utc_now_str()
+    ids = {}
+    for i in range(0, len(items), RESERVE_CHUNK):
+        chunk = items[i:i + RESERVE_CHUNK]
+        values = ", ".join(["(?, ?)"] * len(chunk))
+        params = [v for reminder_id, _ in chunk for v in (reminder_id, sent_at)]
+        rows = conn.execute(
+            f"INSERT INTO executions (reminder_id, sent_at) VALUES {values} RETURNING id, reminder_id",
+            params,
+        ).fetchall()
+        ids.update((row["reminder_id"], row["id"]) for row in rows)
+    enqueue_many(
+        conn, [(ids[reminder_id], text) for reminder_id, text in items], chat_ids,
+        {ids[reminder_id]: when for reminder_id, when in (send_at or {}).items()},
+    )
+    return ids
+
+
+def _catch_up(reminder: dict, now: datetime):
+    """Prossima occorrenza futura di un ricorrente (saltando quelle perse), None se singolo."""
+    return _next_occurrence(reminder, now, catch_up=True)
 
 
 def _calc_next_execution(reminder: dict, from_dt: datetime):
     """Calcola la prossima esecuzione mantenendo l'orario originale del giorno."""
-    rec = reminder.get("recurrence_json")
-    if not rec:
+    return _next_occurrence(reminder, from_dt, catch_up=False)
+
+
+def _next_occurrence(reminder: dict, now: datetime, catch_up: bool):
+    recurrence = compile_recurrence(reminder.get("recurrence_json"))
+    if recurrence is None:
         return None
     try:
-        recurrence = json.loads(rec)
-        rec_type = recurrence.get("type")
-        interval = int(recurrence.get("interval", 1))
-
-        original_str = reminder.get("next_execution")
-        if isinstance(original_str, str):
-            original = datetime.fromisoformat(original_str)
-        else:
-            original = original_str
-        if original and original.tzinfo is None:
-            original = original.replace(tzinfo=timezone.utc)
-
-        if rec_type == "minutely":
-            return from_dt + timedelta(minutes=interval)
-        elif rec_type == "hourly":
-            return from_dt + timedelta(hours=interval)
-        elif rec_type == "daily":
-            return original + timedelta(days=interval)
-        elif rec_type == "weekly":
-            return original + timedelta(weeks=interval)
-        elif rec_type == "monthly":
-            from dateutil.relativedelta import relativedelta
-            return original + relativedelta(months=interval)
-        elif rec_type == "yearly":
-            from dateutil.relativedelta import relativedelta
-            return original + relativedelta(years=interval)
+        original = parse_original(reminder.get("next_execution"))
+        if catch_up:
+            return recurrence.first_after(original, now)
+        return recurrence.next_after(original, now)
     except Exception as e:
         logger.error(f"Errore calcolo ricorrenza: {e}")
     return None
@@ -104,15 +117,19 @@ def recover_stuck_reminders():
     Chiamata all'avvio: gestisce tutti i casi di reminder persi durante il downtime.
 
     Caso 1 — MISSED: reminder 'pending' con next_execution nel passato
-             → inviati subito con prefisso ⏰ PERSO, poi riprogrammati se ricorrenti
+             → accodati subito con prefisso ⏰ PERSO, poi riprogrammati se ricorrenti
 
     Caso 2 — STUCK SENT: reminder 'sent' ricorrenti con next_execution nel passato
              → riprogrammati alla prossima occorrenza futura senza reinvio
+
+    Tutte le scritture avvengono in un'unica transazione.
     """
+    conn = None
     try:
         conn = get_connection()
         now = datetime.now(timezone.utc)
-        now_str = now.strftime("%Y-%m-%dT%H:%M:%S")
+        now_epoch = to_epoch(now)
+        now_str = _utc_now_str()
 
         # ── CASO 1: missed (pending con data passata) ──────────────────────────
         missed_rows = conn.execute(
@@ -120,11 +137,17 @@ def recover_stuck_reminders():
                JOIN users u ON r.user_id = u.id
                WHERE r.status = 'pending'
                AND r.deleted_at IS NULL
-               AND substr(r.next_execution,1,19) <= ?
-               ORDER BY r.next_execution ASC""",
-            (now_str,),
+               AND r.next_execution_epoch <= ?
+               ORDER BY r.next_execution_epoch ASC""",
+            (now_epoch,),
         ).fetchall()
 
+        chat_ids = _get_telegram_config()["chat_ids"]
+        if missed_rows and not chat_ids:
+            logger.warning("Nessun chat_id configurato, recovery reminder persi rimandata")
+            missed_rows = []
+
+        reserve, recurring, single, logs = [], [], [], []
         for row in missed_rows:
             reminder = dict(row)
             try:
@@ -136,152 +159,168 @@ def recover_stuck_reminders():
             except Exception:
                 delay_str = "tempo fa"
 
-            cur = conn.execute(
-                "INSERT INTO executions (reminder_id, sent_at) VALUES (?, ?)",
-                (reminder["id"], _utc_now_str()),
-            )
-            execution_id = cur.lastrowid
-            conn.commit()
+            reserve.append((reminder["id"], f"⏰ PERSO ({delay_str}): {reminder['message']}"))
+            logger.info(f"Reminder missed {reminder['id']} accodato in recovery (ritardo: {delay_str})")
+            logs.append(("INFO", f"Reminder {reminder['id']} accodato in recovery dopo riavvio"))
 
-            text = f"⏰ PERSO ({delay_str}): {reminder['message']}"
-            success = False
-            for chat_id in _get_telegram_config()["chat_ids"]:
-                ok = _send_telegram_sync(chat_id, text, execution_id)
-                success = success or ok
-
-            if success:
-                logger.info(f"Reminder missed {reminder['id']} inviato in recovery (ritardo: {delay_str})")
-                db_log("INFO", f"Reminder {reminder['id']} inviato in recovery dopo riavvio")
-
-                next_exec = _calc_next_execution(reminder, now)
-                while next_exec and next_exec <= now:
-                    reminder["next_execution"] = next_exec.isoformat()
-                    next_exec = _calc_next_execution(reminder, now)
-
-                if next_exec and next_exec > now:
-                    # Ricorrente: sent con prossima data già impostata
-                    conn.execute(
-                        """UPDATE reminders SET status = 'sent', next_execution = ?,
-                           last_sent_at = ?, recurrence_json = ? WHERE id = ?""",
-                        (next_exec.strftime("%Y-%m-%dT%H:%M:%S"), _utc_now_str(),
-                         reminder["recurrence_json"], reminder["id"]),
-                    )
-                else:
-                    # Non ricorrente: sent, aspetta conferma
-                    conn.execute(
-                        "UPDATE reminders SET status = 'sent', last_sent_at = ? WHERE id = ?",
-                        (_utc_now_str(), reminder["id"]),
-                    )
-                conn.commit()
+            next_exec = _catch_up(reminder, now)
+            if next_exec and next_exec > now:
+                # Ricorrente: sent con prossima data già impostata
+                recurring.append((to_utc_str(next_exec), to_epoch(next_exec), now_str,
+                                  reminder["recurrence_json"], reminder["id"]))
             else:
-                conn.execute("DELETE FROM executions WHERE id = ?", (execution_id,))
-                conn.commit()
-                logger.warning(f"Recovery invio fallito per reminder {reminder['id']}, verrà riprovato")
+                # Non ricorrente: sent, aspetta conferma
+                single.append((now_str, reminder["id"]))
+
+        _reserve_executions(conn, reserve, chat_ids)
+        conn.executemany(
+            """UPDATE reminders SET status = 'sent', next_execution = ?,
+               next_execution_epoch = ?, last_sent_at = ?, recurrence_json = ?
+               WHERE id = ?""",
+            recurring,
+        )
+        conn.executemany(
+            "UPDATE reminders SET status = 'sent', last_sent_at = ? WHERE id = ?", single
+        )
 
         # ── CASO 2: stuck sent ricorrenti ──────────────────────────────────────
+        # La SELECT vede gli UPDATE del caso 1 (stessa transazione): i missed
+        # appena riprogrammati hanno già una data futura e non rientrano.
         stuck_rows = conn.execute(
             """SELECT * FROM reminders
                WHERE status = 'sent'
                AND recurrence_json IS NOT NULL
                AND recurrence_json != 'null'
-               AND substr(next_execution,1,19) <= ?
+               AND next_execution_epoch <= ?
                AND deleted_at IS NULL""",
-            (now_str,),
+            (now_epoch,),
         ).fetchall()
 
+        rescheduled, unstuck = [], []
         for row in stuck_rows:
             reminder = dict(row)
-            next_exec = _calc_next_execution(reminder, now)
-            while next_exec and next_exec <= now:
-                reminder["next_execution"] = next_exec.isoformat()
-                next_exec = _calc_next_execution(reminder, now)
-
+            next_exec = _catch_up(reminder, now)
             if next_exec and next_exec > now:
-                conn.execute(
-                    "UPDATE reminders SET status = 'pending', next_execution = ?, last_sent_at = NULL WHERE id = ?",
-                    (next_exec.strftime("%Y-%m-%dT%H:%M:%S"), reminder["id"]),
-                )
+                rescheduled.append((to_utc_str(next_exec), to_epoch(next_exec), reminder["id"]))
             else:
-                conn.execute(
-                    "UPDATE reminders SET status = 'pending' WHERE id = ?",
-                    (reminder["id"],),
-                )
+                unstuck.append((reminder["id"],))
+
+        conn.executemany(
+            """UPDATE reminders SET status = 'pending', next_execution = ?,
+               next_execution_epoch = ?, last_sent_at = NULL WHERE id = ?""",
+            rescheduled,
+        )
+        conn.executemany("UPDATE reminders SET status = 'pending' WHERE id = ?", unstuck)
+        db_log_many(conn, logs)
         conn.commit()
-        conn.close()
+        if reserve:
+            wake()
+        events.publish_rows(list(missed_rows) + list(stuck_rows))
 
     except Exception as e:
         logger.error(f"Errore recover_stuck_reminders: {e}")
+        if conn is not None:
+            conn.rollback()  # rilascia il lock di scrittura prima di db_log
         db_log("ERROR", f"Errore recovery: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
 
 
-def _resend_on_startup():
+def _unconfirmed_reminders(conn, sent_before: str = None) -> list:
     """
-    Chiamata all'avvio: invia subito il sollecito per TUTTE le executions
-    non confermate, indipendentemente da quando sono state inviate.
-    Questo copre il caso in cui il sistema era spento e non ha potuto
-    inviare i solleciti orari.
+    Reminder attivi con almeno un'execution non confermata (opz. l'ultima più
+    vecchia di sent_before). Legge solo idx_executions_unconfirmed, che contiene
+    le sole executions aperte: il costo non cresce con lo storico.
     """
-    try:
-        conn = get_connection()
-        now = _utc_now_str()
-
-        rows = conn.execute(
-            """SELECT e.reminder_id, r.message
+    query = """SELECT e.reminder_id, r.message
                FROM executions e
                JOIN reminders r ON e.reminder_id = r.id
                WHERE e.confirmed = 0
                AND r.deleted_at IS NULL
                AND r.status NOT IN ('paused', 'resolved', 'deleted')
-               GROUP BY e.reminder_id""",
-        ).fetchall()
+               GROUP BY e.reminder_id"""
+    if sent_before is None:
+        return conn.execute(query).fetchall()
+    return conn.execute(query + " HAVING MAX(e.sent_at) <= ?", (sent_before,)).fetchall()
 
-        for row in rows:
-            reminder_id = row["reminder_id"]
-            message = row["message"]
 
-            cur = conn.execute(
-                "INSERT INTO executions (reminder_id, sent_at) VALUES (?, ?)",
-                (reminder_id, now),
-            )
-            execution_id = cur.lastrowid
-            conn.commit()
+def _queue_reminders(conn, rows: list, label: str):
+    """Accoda un sollecito per ogni riga (reminder_id, message) in un'unica transazione."""
+    chat_ids = _get_telegram_config()["chat_ids"]
+    if rows and not chat_ids:
+        logger.warning(f"Nessun chat_id configurato, {label} rimandati")
+        return
+    if not rows:
+        return
 
-            text = f"⚠️ SOLLECITO: {message}"
-            success = False
-            for chat_id in _get_telegram_config()["chat_ids"]:
-                ok = _send_telegram_sync(chat_id, text, execution_id)
-                success = success or ok
+    ids = _reserve_executions(
+        conn, [(row["reminder_id"], f"⚠️ SOLLECITO: {row['message']}") for row in rows], chat_ids
+    )
+    logs = []
+    for reminder_id, execution_id in ids.items():
+        logger.info(f"Sollecito accodato per reminder {reminder_id} (execution {execution_id})")
+        logs.append(("INFO", f"Sollecito reminder {reminder_id}"))
+    db_log_many(conn, logs)
+    conn.commit()
+    wake()
 
-            if success:
-                logger.info(f"Sollecito riavvio inviato per reminder {reminder_id}")
-                db_log("INFO", f"Sollecito riavvio reminder {reminder_id}")
-            else:
-                conn.execute("DELETE FROM executions WHERE id = ?", (execution_id,))
-                conn.commit()
 
-        conn.close()
+def _resend_on_startup():
+    """
+    Chiamata all'avvio: invia subito il sollecito per TUTTE le executions
+    non confermate, indipendentemente da quando sono state inviate.
+    Questo copre il caso in cui il sistema era spento e non ha potuto
+    inviare i solleciti orari.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        _queue_reminders(conn, _unconfirmed_reminders(conn), "solleciti riavvio")
     except Exception as e:
         logger.error(f"Errore _resend_on_startup: {e}")
+        if conn is not None:
+            conn.rollback()  # rilascia il lock di scrittura prima di db_log
         db_log("ERROR", str(e))
+    finally:
+        if conn is not None:
+            conn.close()
 
 
 def check_and_send_reminders():
-    """Job principale: controlla reminder imminenti e li invia."""
+    """
+    Job principale: controlla reminder scaduti e li accoda nell'outbox.
+    Invocato dal dispatcher della coda scadenze (scheduler/due_queue.py) quando
+    un reminder diventa dovuto; rimette in coda le ricorrenze.
+
+    Un ciclo = una transazione: executions riservate in blocco, messaggi
+    nell'outbox, aggiornamenti di stato con executemany, un solo commit.
+    La coda scadenze viene aggiornata solo dopo il commit.
+
+    Con delivery_smoothing_window_sec > 0 prende anche i reminder in scadenza
+    entro la finestra e ne pianifica l'invio nell'outbox (stage_sends), così
+    i picchi a orari tondi vengono distribuiti prima della scadenza.
+    """
     if not _send_lock.acquire(blocking=False):
         logger.debug("check_and_send_reminders già in esecuzione, skip")
         return
+    conn = None
+    rows = []
+    committed = False
+    now = datetime.now(timezone.utc)
     try:
         conn = get_connection()
-        now = datetime.now(timezone.utc)
-        now_str = now.strftime("%Y-%m-%dT%H:%M:%S")
+        now_str = _utc_now_str()
 
         # Prende sia i pending normali sia i ricorrenti 'sent' la cui prossima
-        # occorrenza è già scaduta (utente non ha confermato quella precedente)
+        # occorrenza è già scaduta (utente non ha confermato quella precedente).
+        # status IN + range su epoch → range scan su idx_reminders_due
         rows = conn.execute(
             """SELECT r.*, u.timezone FROM reminders r
                JOIN users u ON r.user_id = u.id
                WHERE r.deleted_at IS NULL
-               AND substr(r.next_execution,1,19) <= ?
+               AND r.status IN ('pending', 'sent')
+               AND r.next_execution_epoch <= ?
                AND (
                    r.status = 'pending'
                    OR (
@@ -291,23 +330,33 @@ def check_and_send_reminders():
                        AND r.recurrence_json != ''
                    )
                )
-               ORDER BY r.next_execution ASC""",
-            (now_str,),
+               ORDER BY r.next_execution_epoch ASC""",
+            (to_epoch(now) + SMOOTHING_WINDOW_SEC,),
         ).fetchall()
 
+        chat_ids = _get_telegram_config()["chat_ids"]
+        if rows and not chat_ids:
+            logger.warning("Nessun chat_id configurato, invio rimandato")
+            for row in rows:
+                schedule_reminder(row["id"], now + timedelta(seconds=RETRY_DELAY_SEC))
+            rows = []
+
+        superseded, reserve, staging, recurring, single, logs = [], [], [], [], [], []
+        # Aggiornamenti della coda scadenze, applicati dopo il commit
+        reschedule, unschedule = [], []
+
+        # La coda scadenze anticipa di SMOOTHING_WINDOW_SEC: per essere
+        # ripresi all'istante `at` i reminder vanno rimessi in coda a at + finestra
+        window = timedelta(seconds=SMOOTHING_WINDOW_SEC)
+
         for row in rows:
             reminder = dict(row)
+            due = datetime.fromtimestamp(reminder["next_execution_epoch"], timezone.utc)
 
-            # Se era 'sent' ricorrente con occorrenza scaduta: marca le vecchie
-            # executions non confermate come superate e procedi con il nuovo invio
-            if reminder["status"] == "sent":
-                conn.execute(
-                    """UPDATE executions SET confirmed = 1, confirmed_at = ?
-                       WHERE reminder_id = ? AND confirmed = 0""",
-                    (_utc_now_str(), reminder["id"]),
-                )
-                conn.commit()
-                logger.info(f"Reminder {reminder['id']} ricorrente: occorrenza precedente superata, invio nuova")
+            lead = _max_lead(reminder)
+            if (due - now).total_seconds() > lead:
+                reschedule.append((reminder["id"], due - timedelta(seconds=lead) + window))
+                continue
 
             # Anti-duplicazione: se già inviato nell'ultimo minuto, skip
             if reminder["last_sent_at"]:
@@ -316,61 +365,89 @@ def check_and_send_reminders():
                     if last.tzinfo is None:
                         last = last.replace(tzinfo=timezone.utc)
                     if (now - last).total_seconds() < 60:
+                        reschedule.append((reminder["id"], last + timedelta(seconds=60) + window))
                         continue
                 except Exception:
                     pass
 
-            cur = conn.execute(
-                "INSERT INTO executions (reminder_id, sent_at) VALUES (?, ?)",
-                (reminder["id"], _utc_now_str()),
+            # Se era 'sent' ricorrente con occorrenza scaduta: marca come superate
+            # le vecchie executions non confermate e procedi con il nuovo invio
+            if reminder["status"] == "sent":
+                superseded.append((now_str, reminder["id"]))
+                logger.info(f"Reminder {reminder['id']} ricorrente: occorrenza precedente superata, invio nuova")
+
+            reserve.append((reminder["id"], reminder["message"]))
+            staging.append((reminder["id"], reminder["next_execution_epoch"]))
+            logs.append(("INFO", f"Reminder {reminder['id']} accodato per l'invio"))
+
+            # Preso in anticipo (finestra di smussamento): minutely/hourly contano dalla scadenza
+            next_exec = _calc_next_execution(reminder, max(now, due))
+            if next_exec:
+                # Ricorrente: va a 'sent' (in attesa conferma)
+                # next_execution è già la prossima data, così quando
+                # l'utente conferma, confirm.py lo rimette a 'pending'
+                recurring.append((to_utc_str(next_exec), to_epoch(next_exec), now_str,
+                                  reminder["recurrence_json"], reminder["id"]))
+                logger.info(f"Reminder {reminder['id']} ricorrente → sent, prossima: {next_exec}")
+                reschedule.append((reminder["id"], next_exec - timedelta(seconds=lead) + window))
+            else:
+                # Non ricorrente: aspetta conferma
+                single.append((now_str, reminder["id"]))
+                unschedule.append(reminder["id"])
+
+        if reserve:
+            # Le vecchie executions vanno chiuse prima di riservare le nuove,
+            # altrimenti l'UPDATE per reminder_id confermerebbe anche queste.
+            # Solo quelle già uscite dall'outbox: un invio ancora pianificato
+            # (smussamento) verrebbe annullato da process_batch senza partire
+            conn.executemany(
+                """UPDATE executions SET confirmed = 1, confirmed_at = ?
+                   WHERE reminder_id = ? AND confirmed = 0
+                   AND NOT EXISTS (SELECT 1 FROM outbox o
+                                   WHERE o.execution_id = executions.id AND o.status = 'pending')""",
+                superseded,
             )
-            execution_id = cur.lastrowid
+            send_at = stage_sends(staging, now.timestamp(), chat_rate(len(chat_ids)), SMOOTHING_WINDOW_SEC)
+            ids = _reserve_executions(conn, reserve, chat_ids, send_at)
+            conn.executemany(
+                """UPDATE reminders
+                   SET status = 'sent',
+                       next_execution = ?,
+                       next_execution_epoch = ?,
+                       last_sent_at = ?,
+                       recurrence_json = ?
+                   WHERE id = ?""",
+                recurring,
+            )
+            conn.executemany(
+                "UPDATE reminders SET last_sent_at = ?, status = 'sent' WHERE id = ?", single
+            )
+            db_log_many(conn, logs)
             conn.commit()
+            committed = True
+            for reminder_id, execution_id in ids.items():
+                logger.info(f"Reminder {reminder_id} accodato (execution {execution_id})")
+            wake()
+            events.publish_rows(row for row in rows if row["id"] in ids)
 
-            success = False
-            for chat_id in _get_telegram_config()["chat_ids"]:
-                ok = _send_telegram_sync(chat_id, reminder["message"], execution_id)
-                success = success or ok
-
-            if success:
-                logger.info(f"Reminder {reminder['id']} inviato (execution {execution_id})")
-                db_log("INFO", f"Reminder {reminder['id']} inviato")
-
-                next_exec = _calc_next_execution(reminder, now)
-
-                if next_exec:
-                    # Ricorrente: va a 'sent' (in attesa conferma)
-                    # next_execution è già la prossima data, così quando
-                    # l'utente conferma, confirm.py lo rimette a 'pending'
-                    conn.execute(
-                        """UPDATE reminders
-                           SET status = 'sent',
-                               next_execution = ?,
-                               last_sent_at = ?,
-                               recurrence_json = ?
-                           WHERE id = ?""",
-                        (next_exec.strftime("%Y-%m-%dT%H:%M:%S"), _utc_now_str(),
-                         reminder["recurrence_json"], reminder["id"]),
-                    )
-                    logger.info(f"Reminder {reminder['id']} ricorrente → sent, prossima: {next_exec}")
-                else:
-                    # Non ricorrente: aspetta conferma
-                    conn.execute(
-                        "UPDATE reminders SET last_sent_at = ?, status = 'sent' WHERE id = ?",
-                        (_utc_now_str(), reminder["id"]),
-                    )
-
-                conn.commit()
-            else:
-                conn.execute("DELETE FROM executions WHERE id = ?", (execution_id,))
-                conn.commit()
-                logger.warning(f"Reminder {reminder['id']}: invio fallito")
+        for reminder_id, when in reschedule:
+            schedule_reminder(reminder_id, when)
+        for reminder_id in unschedule:
+            cancel_reminder(reminder_id)
 
-        conn.close()
     except Exception as e:
         logger.error(f"Errore check_and_send_reminders: {e}")
+        if conn is not None:
+            conn.rollback()  # rilascia il lock di scrittura prima di db_log
         db_log("ERROR", str(e))
+        if not committed:
+            # Transazione annullata: i reminder restano
+            # dovuti nel DB, li rimettiamo in coda per un nuovo tentativo
+            for row in rows:
+                schedule_reminder(row["id"], now + timedelta(seconds=RETRY_DELAY_SEC))
     finally:
+        if conn is not None:
+            conn.close()
         _send_lock.release()
 
 
@@ -380,48 +457,17 @@ def resend_unconfirmed_reminders():
     (sia reminder singoli che ricorrenti) più vecchia di 1 ora.
     Continua ogni ora finché l'utente non preme ✔.
     """
+    conn = None
     try:
         conn = get_connection()
         now = datetime.now(timezone.utc)
         one_hour_ago = (now - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S")
-
-        rows = conn.execute(
-            """SELECT e.reminder_id, r.message
-               FROM executions e
-               JOIN reminders r ON e.reminder_id = r.id
-               WHERE e.confirmed = 0
-               AND r.deleted_at IS NULL
-               AND r.status NOT IN ('paused', 'resolved', 'deleted')
-               GROUP BY e.reminder_id
-               HAVING MAX(substr(e.sent_at,1,19)) <= ?""",
-            (one_hour_ago,),
-        ).fetchall()
-
-        for row in rows:
-            reminder_id = row["reminder_id"]
-            message = row["message"]
-
-            cur = conn.execute(
-                "INSERT INTO executions (reminder_id, sent_at) VALUES (?, ?)",
-                (reminder_id, _utc_now_str()),
-            )
-            execution_id = cur.lastrowid
-            conn.commit()
-
-            text = f"⚠️ SOLLECITO: {message}"
-            success = False
-            for chat_id in _get_telegram_config()["chat_ids"]:
-                ok = _send_telegram_sync(chat_id, text, execution_id)
-                success = success or ok
-
-            if success:
-                logger.info(f"Sollecito inviato per reminder {reminder_id} (execution {execution_id})")
-                db_log("INFO", f"Sollecito reminder {reminder_id}")
-            else:
-                conn.execute("DELETE FROM executions WHERE id = ?", (execution_id,))
-                conn.commit()
-
-        conn.close()
+        _queue_reminders(conn, _unconfirmed_reminders(conn, one_hour_ago), "solleciti")
     except Exception as e:
         logger.error(f"Errore resend_unconfirmed: {e}")
+        if conn is not None:
+            conn.rollback()  # rilascia il lock di scrittura prima di db_log
         db_log("ERROR", str(e))
+    finally:
+        if conn is not None:
+            conn.close()
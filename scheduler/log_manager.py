@@ -1,6 +1,16 @@
+import atexit
+import copy
+import gzip
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import sqlite3
 import sys
+import threading
+import time
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,67 +27,282 @@ LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 LOG_MAX_BYTES = CONFIG.get("log_max_size_mb", 10) * 1024 * 1024
 LOG_CLEANUP_BYTES = CONFIG.get("log_cleanup_mb", 5) * 1024 * 1024
+LOG_COMPRESS = CONFIG.get("log_compress", True)
 
+# Scrittura asincrona dei log su DB (vedi db_log)
+DB_LOG_QUEUE_SIZE = CONFIG.get("db_log_queue_size", 10000)
+DB_LOG_BATCH_SIZE = max(int(CONFIG.get("db_log_batch_size", 200)), 1)
+DB_LOG_FLUSH_SEC = CONFIG.get("db_log_flush_sec", 1.0)
 
-def rotate_log_if_needed():
-    """Rotazione FIFO: se il log supera LOG_MAX_BYTES, taglia le righe più vecchie."""
-    if not LOG_PATH.exists():
-        return
-    size = LOG_PATH.stat().st_size
-    if size < LOG_MAX_BYTES:
-        return
+# File condiviso da tutti i logger del processo: un solo handler (scritto dal
+# solo thread del QueueListener), quindi nessuna gara sulla rotazione
+_file_handler = None
+_console_handler = None
+_queue_handler = None
+_listener = None
+_handlers_lock = threading.Lock()
 
-    with open(LOG_PATH, "r", encoding="utf-8", errors="replace") as f:
-        lines = f.readlines()
 
-    # Calcola quante righe rimuovere per liberare LOG_CLEANUP_BYTES
-    to_remove_bytes = 0
-    cut_index = 0
-    for i, line in enumerate(lines):
-        to_remove_bytes += len(line.encode("utf-8"))
-        if to_remove_bytes >= LOG_CLEANUP_BYTES:
-            cut_index = i + 1
-            break
+def _gzip_file(src: str, dest: str):
+    """Comprime `src` in `dest` a blocchi (pubblicato via rename) e rimuove `src`."""
+    partial = dest + ".part"
+    with open(src, "rb") as f_in, gzip.open(partial, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    os.replace(partial, dest)
+    os.remove(src)
 
-    with open(LOG_PATH, "w", encoding="utf-8") as f:
-        f.writelines(lines[cut_index:])
 
+class SegmentedFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotazione a segmenti in streaming: app.log → app.log.1[.gz] → app.log.2[.gz] …
+
+    Il file corrente viene copiato a blocchi nel segmento e troncato sul posto
+    (copytruncate): l'inode resta lo stesso, quindi anche chi scrive in append
+    dall'esterno (stdout/stderr di systemd, vedi install.sh) continua a funzionare.
+    La compressione gzip del segmento avviene in un thread a parte.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, compress: bool):
+        super().__init__(
+            filename, mode="a", maxBytes=max_bytes, backupCount=backup_count,
+            encoding="utf-8", delay=True,
+        )
+        self.compress = compress
+        self._compressor = None
+
+    def _segment(self, index: int) -> str:
+        return f"{self.baseFilename}.{index}" + (".gz" if self.compress else "")
+
+    def doRollover(self):
+        # Il gzip del giro precedente deve finire prima di far scorrere i segmenti
+        if self._compressor is not None:
+            self._compressor.join()
+            self._compressor = None
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        for i in range(self.backupCount - 1, 0, -1):
+            src, dest = self._segment(i), self._segment(i + 1)
+            if os.path.exists(src):
+                os.replace(src, dest)
+
+        raw = f"{self.baseFilename}.1.tmp" if self.compress else self._segment(1)
+        if os.path.exists(self.baseFilename):
+            with open(self.baseFilename, "rb") as f_in, open(raw, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.truncate(self.baseFilename, 0)
+            if self.compress:
+                self._compressor = threading.Thread(
+                    target=_gzip_file, args=(raw, self._segment(1)), name="log-gzip", daemon=True
+                )
+                self._compressor.start()
+
+        self.stream = self._open()
+
+
+class JsonFormatter(logging.Formatter):
+    """Una riga JSON per record (log_format: json), per l'ingestione strutturata."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler che lascia il traceback in exc_text (non lo fonde nel messaggio)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _default_level() -> int:
+    return logging.DEBUG if CONFIG.get("app_env", "dev") == "dev" else logging.INFO
+
+
+def _level_for(name: str) -> int:
+    """Livello per sottosistema da `log_levels` (prefisso puntato più lungo), altrimenti da app_env."""
+    levels = CONFIG.get("log_levels") or {}
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        level = levels.get(".".join(parts[:i]))
+        if level:
+            return logging.getLevelName(str(level).upper())
+    return _default_level()
+
+
+def _get_queue_handler() -> logging.Handler:
+    """
+    QueueHandler condiviso: chi logga mette solo il record in coda. Un unico
+    thread (QueueListener) scrive su file e console, fuori dai thread di invio,
+    dall'event loop del bot e dalle richieste web.
+    """
+    global _file_handler, _console_handler, _queue_handler, _listener
+    with _handlers_lock:
+        if _queue_handler is None:
+            if CONFIG.get("log_format", "text") == "json":
+                fmt = JsonFormatter()
+            else:
+                fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+            # Stessi limiti di prima: segmenti da log_cleanup_mb, totale entro log_max_size_mb
+            _file_handler = SegmentedFileHandler(
+                str(LOG_PATH),
+                max_bytes=LOG_CLEANUP_BYTES,
+                backup_count=max(int(LOG_MAX_BYTES // LOG_CLEANUP_BYTES) - 1, 1),
+                compress=LOG_COMPRESS,
+            )
+            _file_handler.setFormatter(fmt)
+            _console_handler = logging.StreamHandler()
+            _console_handler.setFormatter(fmt)
+
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(
+                log_queue, _file_handler, _console_handler, respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(_listener.stop)
+            _queue_handler = _QueueHandler(log_queue)
+    return _queue_handler
 
-def get_logger(name: str) -> logging.Logger:
-    rotate_log_if_needed()
 
+def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
     if logger.handlers:
         return logger
 
-    level = logging.DEBUG if CONFIG.get("app_env", "dev") == "dev" else logging.INFO
-    logger.setLevel(level)
+    logger.setLevel(_level_for(name))
+    logger.addHandler(_get_queue_handler())
+    # I record arrivano già al listener: niente doppioni da eventuali handler su root
+    logger.propagate = False
 
-    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    return logger
 
-    # File handler
-    fh = logging.FileHandler(str(LOG_PATH), encoding="utf-8")
-    fh.setFormatter(fmt)
-    logger.addHandler(fh)
 
-    # Console handler
-    ch = logging.StreamHandler()
-    ch.setFormatter(fmt)
-    logger.addHandler(ch)
+# ── Log su DB ─────────────────────────────────────────────────────────────────
+# db_log() non scrive: mette la riga in una coda limitata in memoria. Un thread
+# dedicato la svuota a lotti (per dimensione o ogni DB_LOG_FLUSH_SEC) su una
+# connessione propria, fuori dal pool usato da scheduler e web. Se la coda è
+# piena il messaggio viene scartato e contato: il log non blocca mai l'invio.
 
-    return logger
+_db_log_queue = queue.Queue(maxsize=DB_LOG_QUEUE_SIZE)
+_db_log_stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+_db_log_lock = threading.Lock()
+_db_log_thread = None
 
 
-def db_log(log_type: str, message: str):
-    """Salva un log anche nel database."""
+def _count(key: str, n: int = 1):
+    with _db_log_lock:
+        _db_log_stats[key] += n
+
+
+def _open_log_connection() -> sqlite3.Connection:
+    """Connessione dedicata al writer dei log."""
+    from backend.database import DB_PATH
+    conn = sqlite3.connect(DB_PATH, timeout=2)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Il writer dei log non esegue checkpoint: li lasciano alle altre connessioni
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("PRAGMA busy_timeout=2000")
+    return conn
+
+
+def _write_batch(conn, batch: list):
     try:
-        from backend.database import get_connection
-        conn = get_connection()
-        conn.execute(
-            "INSERT INTO logs (type, message) VALUES (?, ?)", (log_type, message)
-        )
+        conn.executemany("INSERT INTO logs (type, message) VALUES (?, ?)", batch)
         conn.commit()
-        conn.close()
-    except Exception:
-        pass
+        _count("written", len(batch))
+        _count("batches")
+    except sqlite3.Error as e:
+        conn.rollback()
+        _count("failed", len(batch))
+        get_logger("scheduler.db_log").warning(f"Scrittura di {len(batch)} log su DB fallita: {e}")
+
+
+def _db_log_worker():
+    """Loop del writer: accumula fino a DB_LOG_BATCH_SIZE righe o DB_LOG_FLUSH_SEC secondi."""
+    conn = None
+    while True:
+        batch = [_db_log_queue.get()]
+        deadline = time.monotonic() + DB_LOG_FLUSH_SEC
+        while len(batch) < DB_LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_db_log_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            if conn is None:
+                conn = _open_log_connection()
+            _write_batch(conn, batch)
+        except sqlite3.Error as e:
+            _count("failed", len(batch))
+            get_logger("scheduler.db_log").warning(f"Connessione log DB non disponibile: {e}")
+            conn = None
+        finally:
+            for _ in batch:
+                _db_log_queue.task_done()
+
+
+def _ensure_db_log_worker():
+    global _db_log_thread
+    if _db_log_thread is not None:
+        return
+    with _db_log_lock:
+        if _db_log_thread is None:
+            _db_log_thread = threading.Thread(target=_db_log_worker, name="db-log", daemon=True)
+            _db_log_thread.start()
+            atexit.register(flush_db_log)
+
+
+def db_log(log_type: str, message: str):
+    """Salva un log anche nel database (asincrono, a lotti: vedi sopra)."""
+    _ensure_db_log_worker()
+    try:
+        _db_log_queue.put_nowait((log_type, message))
+        _count("queued")
+    except queue.Full:
+        _count("dropped")
+
+
+def flush_db_log(timeout: float = 5.0) -> bool:
+    """Attende (al massimo `timeout` secondi) che i log in coda siano scritti."""
+    deadline = time.monotonic() + timeout
+    while _db_log_queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def get_db_log_stats() -> dict:
+    """Contatori del writer: accodati, scritti, scartati (coda piena), falliti, lotti, in coda."""
+    with _db_log_lock:
+        stats = dict(_db_log_stats)
+    stats["pending"] = _db_log_queue.qsize()
+    return stats
+
 
+def db_log_many(conn, entries: list):
+    """
+    Salva più log [(type, message)] usando la connessione del chiamante.
+    Non fa commit: i log finiscono nella stessa transazione dei dati.
+    """
+    if entries:
+        conn.executemany("INSERT INTO logs (type, message) VALUES (?, ?)", entries)
@@ -0,0 +1,188 @@
+"""
+Occorrenze future materializzate (tabella occurrences) per agenda e calendario.
+
+Ogni reminder attivo viene espanso una volta sola sull'orizzonte configurato
+(next_execution più le ricorrenze successive via scheduler/recurrence.py) e
+le date finiscono in una tabella indicizzata per (user_id, occurs_epoch):
+l'agenda legge un intervallo senza interpretare recurrence_json a ogni
+richiesta.
+
+Oltre MAX_PER_REMINDER occorrenze (minutely/hourly) l'espansione si ferma:
+la data dell'ultima materializzata finisce in occurrences_truncated, così chi
+legge sa fin dove le occorrenze di quel reminder sono complete.
+
+Aggiornamento incrementale: events.publish() segna come da ricalcolare i
+reminder cambiati (mark_dirty), flush() li riespande in un'unica transazione
+prima di ogni lettura dell'agenda. Il rebuild completo periodico fa scorrere
+l'orizzonte e copre le modifiche fatte fuori dal processo.
+"""
+
+import json
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from backend.database import get_connection, to_epoch
+from scheduler.log_manager import get_logger
+from scheduler.recurrence import compile_recurrence, parse_original
+
+logger = get_logger("scheduler.occurrences")
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+HORIZON_DAYS = CONFIG.get("occurrences_horizon_days", 31)
+# Limite per reminder: un 'minutely' sull'intero orizzonte sarebbero decine di migliaia di righe
+MAX_PER_REMINDER = CONFIG.get("occurrences_max_per_reminder", 1000)
+REBUILD_SEC = CONFIG.get("occurrences_rebuild_sec", 3600)
+INSERT_CHUNK = 5000
+
+# Stesso criterio della coda scadenze: pending, oppure 'sent' con ricorrenza
+_ACTIVE_SQL = """SELECT id, user_id, next_execution, recurrence_json, status FROM reminders
+                 WHERE deleted_at IS NULL AND status IN ('pending', 'sent')"""
+
+_dirty = set()
+_lock = threading.Lock()
+# Serializza flush() e rebuild() nel processo
+_refresh_lock = threading.Lock()
+# Fine dell'intervallo materializzato dall'ultimo rebuild (None = mai costruito)
+_materialized_until = None
+
+
+def mark_dirty(reminder_ids):
+    """Segna i reminder da riespandere al prossimo flush()."""
+    with _lock:
+        _dirty.update(reminder_ids)
+
+
+def expand(reminder, end: datetime, limit: int = MAX_PER_REMINDER) -> list:
+    """
+    Date (datetime UTC) in cui il reminder scatterà fino a `end` incluso:
+    next_execution e, se ricorrente, le occorrenze successive.
+    """
+    recurrence = compile_recurrence(reminder["recurrence_json"])
+    if reminder["status"] == "sent" and recurrence is None:
+        return []  # singolo già inviato: attende solo la conferma
+    first = parse_original(reminder["next_execution"])
+    if first > end:
+        return []
+    if recurrence is None:
+        return [first]
+    out = [first]
+    k = 1
+    while len(out) < limit:
+        when = recurrence.occurrence(first, k)
+        if when > end:
+            break
+        out.append(when)
+        k += 1
+    return out
+
+
+def _expand_rows(rows, end: datetime) -> tuple:
+    """
+    (righe occurrences, righe occurrences_truncated) per i reminder dati:
+    un'occorrenza oltre il limite entro `end` indica un'espansione troncata.
+    """
+    params, truncated = [], []
+    for row in rows:
+        try:
+            dates = expand(row, end, MAX_PER_REMINDER + 1)
+        except Exception as e:
+            logger.error(f"Espansione occorrenze reminder {row['id']} fallita: {e}")
+            continue
+        if len(dates) > MAX_PER_REMINDER:
+            dates.pop()
+            truncated.append((row["id"], row["user_id"], to_epoch(dates[-1])))
+        params += [(row["id"], row["user_id"], to_epoch(when)) for when in dates]
+    return params, truncated
+
+
+def _insert(conn, expanded: tuple):
+    params, truncated = expanded
+    for i in range(0, len(params), INSERT_CHUNK):
+        conn.executemany(
+            "INSERT OR IGNORE INTO occurrences (reminder_id, user_id, occurs_epoch) VALUES (?, ?, ?)",
+            params[i:i + INSERT_CHUNK],
+        )
+    conn.executemany(
+        "INSERT OR REPLACE INTO occurrences_truncated (reminder_id, user_id, until_epoch) VALUES (?, ?, ?)",
+        truncated,
+    )
+
+
+def rebuild() -> int:
+    """Riespande tutti i reminder attivi sull'orizzonte corrente (una transazione)."""
+    global _materialized_until
+    with _refresh_lock:
+        end = datetime.now(timezone.utc) + timedelta(days=HORIZON_DAYS)
+        with _lock:
+            _dirty.clear()
+        conn = get_connection()
+        try:
+            expanded = _expand_rows(conn.execute(_ACTIVE_SQL).fetchall(), end)
+            conn.execute("DELETE FROM occurrences")
+            conn.execute("DELETE FROM occurrences_truncated")
+            _insert(conn, expanded)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        _materialized_until = end
+    params, truncated = expanded
+    logger.info(
+        f"Occorrenze ricostruite: {len(params)} righe fino a {end:%Y-%m-%d}"
+        f" ({len(truncated)} reminder oltre il limite di {MAX_PER_REMINDER})"
+    )
+    return len(params)
+
+
+def flush() -> int:
+    """Riespande solo i reminder segnati da mark_dirty(); restituisce quanti."""
+    with _refresh_lock:
+        with _lock:
+            if not _dirty:
+                return 0
+            ids = list(_dirty)
+            _dirty.clear()
+        end = datetime.now(timezone.utc) + timedelta(days=HORIZON_DAYS)
+        ids_json = json.dumps(ids)
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                _ACTIVE_SQL + " AND id IN (SELECT value FROM json_each(?))", (ids_json,)
+            ).fetchall()
+            for table in ("occurrences", "occurrences_truncated"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE reminder_id IN (SELECT value FROM json_each(?))", (ids_json,)
+                )
+            _insert(conn, _expand_rows(rows, end))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            mark_dirty(ids)  # riprova al prossimo flush
+            raise
+        finally:
+            conn.close()
+    return len(ids)
+
+
+def ensure_fresh() -> datetime:
+    """
+    Applica le modifiche in sospeso (rebuild se la tabella non è mai stata
+    costruita in questo processo) e restituisce la fine dell'intervallo
+    materializzato: oltre quella data l'agenda sarebbe incompleta.
+    """
+    if _materialized_until is None:
+        rebuild()
+    else:
+        flush()
+    return _materialized_until
@@ -0,0 +1,222 @@
+"""
+Coda persistente dei messaggi Telegram in uscita (tabella outbox).
+
+I job dello scheduler accodano un messaggio per chat_id nella stessa
+transazione che crea l'execution; un worker dedicato li invia rispettando
+i limiti Telegram (token bucket globale e per chat), onora `retry_after`
+sulle risposte 429 e ritenta gli altri errori con backoff esponenziale e
+jitter. Un invio fallito non cancella più l'execution: resta in coda.
+"""
+
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from backend.database import get_connection, get_telegram_config
+from scheduler.log_manager import get_logger, db_log
+from scheduler.telegram_sender import send_messages
+
+logger = get_logger("scheduler.outbox")
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+# Limiti Telegram: ~30 msg/s globali, ~1 msg/s per singola chat
+GLOBAL_RATE = CONFIG.get("telegram_global_rate", 30)
+CHAT_RATE = CONFIG.get("telegram_chat_rate", 1)
+MAX_ATTEMPTS = CONFIG.get("outbox_max_attempts", 10)
+BACKOFF_BASE_SEC = CONFIG.get("outbox_backoff_base_sec", 2)
+BACKOFF_MAX_SEC = CONFIG.get("outbox_backoff_max_sec", 600)
+BATCH_SIZE = 100
+IDLE_SEC = 30
+NO_TOKEN_RETRY_SEC = 60
+
+# Errori definitivi: chat inesistente, bot bloccato, richiesta malformata
+PERMANENT_STATUSES = {400, 403, 404}
+
+
+class TokenBucket:
+    """Token bucket: `rate` token al secondo, al massimo `capacity` accumulati."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Secondi da attendere prima che un token sia disponibile (0 = subito)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Sospende il bucket (es. retry_after ricevuto da Telegram)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+_global_bucket = TokenBucket(GLOBAL_RATE)
+_chat_buckets = {}
+_wake = threading.Event()
+
+
+def _chat_bucket(chat_id: int) -> TokenBucket:
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        bucket = _chat_buckets[chat_id] = TokenBucket(CHAT_RATE)
+    return bucket
+
+
+def _backoff(attempts: int) -> float:
+    """Backoff esponenziale con jitter (metà fissa, metà casuale)."""
+    delay = min(BACKOFF_BASE_SEC * (2 ** attempts), BACKOFF_MAX_SEC)
+    return random.uniform(delay / 2, delay)
+
+
+def enqueue(conn, execution_id: int, text: str, chat_ids: list):
+    """
+    Accoda il messaggio di un'execution per ogni chat_id.
+    Non fa commit: va eseguito nella transazione del chiamante, poi wake().
+    """
+    enqueue_many(conn, [(execution_id, text)], chat_ids)
+
+
+def enqueue_many(conn, messages: list, chat_ids: list, send_at: dict = None):
+    """
+    Come enqueue() per una lista di (execution_id, text), con un solo executemany.
+    `send_at` ({execution_id: epoch}) posticipa i singoli invii (smussamento dei picchi).
+    """
+    now = time.time()
+    send_at = send_at or {}
+    conn.executemany(
+        "INSERT INTO outbox (execution_id, chat_id, text, next_attempt_at) VALUES (?, ?, ?, ?)",
+        [(execution_id, chat_id, text, send_at.get(execution_id, now))
+         for execution_id, text in messages for chat_id in chat_ids],
+    )
+
+
+def wake():
+    """Sveglia il worker dopo un commit di nuovi messaggi."""
+    _wake.set()
+
+
+def process_batch() -> float:
+    """
+    Invia un lotto di messaggi dovuti rispettando i token bucket.
+    Restituisce i secondi da attendere prima del giro successivo.
+    """
+    now = time.time()
+    conn = get_connection()
+    rows = conn.execute(
+        """SELECT o.*, e.confirmed FROM outbox o
+           JOIN executions e ON e.id = o.execution_id
+           WHERE o.status = 'pending' AND o.next_attempt_at <= ?
+           ORDER BY o.next_attempt_at, o.id
+           LIMIT ?""",
+        (now, BATCH_SIZE),
+    ).fetchall()
+
+    if not rows:
+        next_at = conn.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+        ).fetchone()[0]
+        conn.close()
+        return IDLE_SEC if next_at is None else min(max(next_at - now, 0.05), IDLE_SEC)
+
+    # Execution già confermata (o superata): il messaggio non serve più
+    cancelled = [(r["id"],) for r in rows if r["confirmed"]]
+    rows = [r for r in rows if not r["confirmed"]]
+
+    token = get_telegram_config()["telegram_token"]
+    if not token:
+        logger.warning("Token Telegram non configurato, outbox in attesa")
+        conn.executemany(
+            "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+            [(now + NO_TOKEN_RETRY_SEC, r["id"]) for r in rows],
+        )
+        conn.executemany("UPDATE outbox SET status = 'cancelled' WHERE id = ?", cancelled)
+        conn.commit()
+        conn.close()
+        return NO_TOKEN_RETRY_SEC
+
+    selected = []
+    wait = None
+    mono = time.monotonic()
+    for r in rows:
+        bucket = _chat_bucket(r["chat_id"])
+        w = max(_global_bucket.wait_time(mono), bucket.wait_time(mono))
+        if w > 0:
+            wait = w if wait is None else min(wait, w)
+            if _global_bucket.wait_time(mono) > 0:
+                break
+            continue
+        _global_bucket.take(mono)
+        bucket.take(mono)
+        selected.append(r)
+
+    results = send_messages(token, [(r["chat_id"], r["text"], r["execution_id"]) for r in selected])
+
+    now = time.time()
+    sent, retry, failed = [], [], []
+    for r, res in zip(selected, results):
+        attempts = r["attempts"] + 1
+        if res["ok"]:
+            sent.append((attempts, r["id"]))
+            logger.info(f"Execution {r['execution_id']} inviata a chat {r['chat_id']}")
+        elif res["retry_after"] is not None:
+            _chat_bucket(r["chat_id"]).block(res["retry_after"])
+            retry.append((attempts, now + res["retry_after"], res["error"], r["id"]))
+            logger.warning(f"Telegram 429 per chat {r['chat_id']}, retry tra {res['retry_after']}s")
+        elif res["status"] in PERMANENT_STATUSES or attempts >= MAX_ATTEMPTS:
+            failed.append((attempts, res["error"], r["id"]))
+            logger.error(f"Execution {r['execution_id']}: invio a chat {r['chat_id']} fallito definitivamente ({res['error']})")
+            db_log("ERROR", f"Invio execution {r['execution_id']} a chat {r['chat_id']} fallito: {res['error']}")
+        else:
+            retry.append((attempts, now + _backoff(attempts), res["error"], r["id"]))
+
+    conn.executemany(
+        "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = CURRENT_TIMESTAMP WHERE id = ?", sent
+    )
+    conn.executemany(
+        "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", retry
+    )
+    conn.executemany(
+        "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?", failed
+    )
+    conn.executemany("UPDATE outbox SET status = 'cancelled' WHERE id = ?", cancelled)
+    conn.commit()
+    conn.close()
+
+    if selected or cancelled:
+        return 0
+    return wait if wait is not None else 0.05
+
+
+def run_outbox_worker():
+    """Loop del worker outbox (blocca il thread)."""
+    logger.info("Worker outbox Telegram avviato")
+    while True:
+        try:
+            delay = process_batch()
+        except Exception as e:
+            logger.error(f"Errore worker outbox: {e}")
+            delay = 5
+        if delay > 0:
+            _wake.wait(delay)
+            _wake.clear()
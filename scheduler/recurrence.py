@@ -0,0 +1,146 @@
+"""
+Regole di ricorrenza compilate (recurrence_json → Recurrence).
+
+Ogni recurrence_json distinto viene interpretato una sola volta (cache LRU)
+in un oggetto immutabile condiviso da scheduler, conferme e bot. Il calcolo
+della prossima occorrenza dopo un downtime è diretto invece che passo passo:
+aritmetico per gli intervalli fissi, per mesi/anni salta all'ultimo mese
+utile e corregge di al più un paio di passi.
+
+Semantica invariata rispetto al vecchio calcolo incrementale:
+  - minutely/hourly contano dall'istante di calcolo, non dalla data originale;
+  - daily/weekly/monthly/yearly mantengono l'orario della data originale;
+  - monthly/yearly riportano il giorno all'ultimo del mese quando non esiste
+    (31 → 30 → 28…) e da lì in poi restano su quel giorno, come sommare
+    ripetutamente relativedelta(months=…).
+"""
+
+import calendar
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from scheduler.log_manager import get_logger
+
+logger = get_logger("scheduler.recurrence")
+
+# type → passo fisso (moltiplicato per interval)
+FIXED_STEPS = {
+    "minutely": timedelta(minutes=1),
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+# type → mesi per unità di interval
+MONTH_STEPS = {"monthly": 1, "yearly": 12}
+# Questi tipi ripartono dall'istante di calcolo invece che dalla data originale
+FROM_NOW_TYPES = ("minutely", "hourly")
+
+# Giorni minimi di ciascun mese (febbraio non bisestile)
+_MIN_MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class Recurrence:
+    """Regola di ricorrenza interpretata; immutabile, condivisa tra thread."""
+
+    __slots__ = ("type", "interval", "_step", "_months")
+
+    def __init__(self, rec_type: str, interval: int):
+        set_ = super().__setattr__
+        set_("type", rec_type)
+        set_("interval", interval)
+        set_("_step", FIXED_STEPS[rec_type] * interval if rec_type in FIXED_STEPS else None)
+        set_("_months", MONTH_STEPS[rec_type] * interval if rec_type in MONTH_STEPS else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Recurrence è immutabile")
+
+    def __repr__(self):
+        return f"Recurrence({self.type!r}, {self.interval})"
+
+    def next_after(self, original: datetime, from_dt: datetime) -> datetime:
+        """Un solo passo: l'occorrenza successiva a `original` (o a from_dt per minutely/hourly)."""
+        if self.type in FROM_NOW_TYPES:
+            return from_dt + self._step
+        return self.occurrence(original, 1)
+
+    def first_after(self, original: datetime, now: datetime) -> datetime:
+        """Prima occorrenza strettamente successiva a `now`, saltando quelle perse."""
+        if self.type in FROM_NOW_TYPES:
+            return now + self._step
+        if self._step is not None:
+            # Il più piccolo k >= 1 con original + k*step > now
+            k = max(1, (now - original) // self._step + 1)
+            return original + self._step * k
+        months = (now.year - original.year) * 12 + now.month - original.month
+        k = max(1, months // self._months)
+        while k > 1 and self.occurrence(original, k - 1) > now:
+            k -= 1
+        candidate = self.occurrence(original, k)
+        while candidate <= now:
+            k += 1
+            candidate = self.occurrence(original, k)
+        return candidate
+
+    def occurrence(self, original: datetime, k: int) -> datetime:
+        """k-esima occorrenza dopo `original` (k = 0 → original)."""
+        if self._step is not None:
+            return original + self._step * k
+        year, month0 = divmod(original.year * 12 + original.month - 1 + k * self._months, 12)
+        return original.replace(year=year, month=month0 + 1, day=self._clamped_day(original, k))
+
+    def _clamped_day(self, original: datetime, k: int) -> int:
+        """Giorno dopo k passi: il minimo tra il giorno originale e le lunghezze dei mesi attraversati."""
+        day = original.day
+        if day <= 28 or k <= 0:
+            return day
+        base = original.year * 12 + original.month - 1
+        # Minimo raggiungibile: da lì il giorno non può più scendere
+        floor = min(_MIN_MONTH_DAYS[(base + j * self._months) % 12] for j in range(1, 13))
+        for j in range(1, k + 1):
+            year, month0 = divmod(base + j * self._months, 12)
+            day = min(day, calendar.monthrange(year, month0 + 1)[1])
+            if day <= floor:
+                break
+        return day
+
+
+@lru_cache(maxsize=1024)
+def compile_recurrence(recurrence_json):
+    """
+    Recurrence per il recurrence_json dato, None se assente o non valido
+    (tipo sconosciuto, interval < 1). Il risultato è in cache per stringa.
+    """
+    if not recurrence_json or recurrence_json == "null":
+        return None
+    try:
+        rec = json.loads(recurrence_json)
+        rec_type = rec.get("type")
+        interval = int(rec.get("interval", 1))
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Ricorrenza non valida {recurrence_json!r}: {e}")
+        return None
+    if rec_type not in FIXED_STEPS and rec_type not in MONTH_STEPS:
+        return None
+    if interval < 1:
+        logger.error(f"Ricorrenza non valida {recurrence_json!r}: interval < 1")
+        return None
+    return Recurrence(rec_type, interval)
+
+
+def is_recurring(recurrence_json) -> bool:
+    return compile_recurrence(recurrence_json) is not None
+
+
+def parse_original(value):
+    """next_execution (stringa ISO o datetime) come datetime aware; senza offset = UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
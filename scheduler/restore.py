@@ -0,0 +1,101 @@
+"""
+Restore point-in-time dai backup incrementali (scheduler/incremental_backup.py).
+
+Uso:
+    python -m scheduler.restore --list
+    python -m scheduler.restore --at 2026-03-25T09:30:00 --out data/restored.db
+
+`--at` è in UTC se senza offset (default: adesso). Il DB ricostruito viene
+verificato con `PRAGMA integrity_check`. Per sostituire il DB in uso fermare
+prima l'applicazione e copiare il file risultante al posto di reminder.db.
+"""
+
+import argparse
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from scheduler.incremental_backup import list_chains, parse_stamp, read_delta, stamp
+
+
+def _delta_time(path: Path) -> float:
+    return parse_stamp(path.name[: -len(".delta.gz")])
+
+
+def restore(at: float, out: Path) -> float:
+    """
+    Ricostruisce in `out` il DB all'ultimo punto salvato <= `at` (epoch UTC).
+    Restituisce il timestamp effettivo del punto ripristinato.
+    """
+    chains = [(chain, deltas) for chain, deltas in list_chains() if _delta_time(deltas[0]) <= at]
+    if not chains:
+        raise ValueError("Nessun backup incrementale disponibile per il momento richiesto")
+    _, deltas = chains[-1]
+    deltas = [d for d in deltas if _delta_time(d) <= at]
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("-wal", "-shm"):
+        Path(str(out) + suffix).unlink(missing_ok=True)
+
+    restored_at = None
+    with open(out, "wb") as f:
+        for path in deltas:
+            page_size, page_count, ts, pages = read_delta(path)
+            for pgno, page in pages:
+                f.seek((pgno - 1) * page_size)
+                f.write(page)
+            f.truncate(page_count * page_size)
+            restored_at = ts
+
+    conn = sqlite3.connect(out)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise RuntimeError(f"integrity_check fallito sul DB ripristinato: {result}")
+    return restored_at
+
+
+def _parse_at(value: str) -> float:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restore point-in-time del database reminder")
+    parser.add_argument("--list", action="store_true", help="elenca le catene e i punti di restore")
+    parser.add_argument("--at", help="momento da ripristinare (ISO, UTC se senza offset; default adesso)")
+    parser.add_argument("--out", default=str(BASE_DIR / "data" / "restored.db"), help="file DB da creare")
+    parser.add_argument("--force", action="store_true", help="sovrascrive --out se esiste")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for chain, deltas in list_chains():
+            first, last = _delta_time(deltas[0]), _delta_time(deltas[-1])
+            print(f"{chain.name}: {len(deltas)} punti, da {stamp(first)} a {stamp(last)}")
+        return 0
+
+    out = Path(args.out)
+    if out.exists() and not args.force:
+        print(f"{out} esiste già (usa --force per sovrascrivere)", file=sys.stderr)
+        return 1
+
+    at = _parse_at(args.at) if args.at else datetime.now(timezone.utc).timestamp()
+    try:
+        restored_at = restore(at, out)
+    except (ValueError, RuntimeError) as e:
+        print(f"Restore fallito: {e}", file=sys.stderr)
+        return 1
+    print(f"DB ripristinato al {stamp(restored_at)} in {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
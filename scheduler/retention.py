@@ -0,0 +1,146 @@
+"""
+Retention dello storico: executions, outbox e logs non crescono all'infinito.
+
+Le executions chiuse più vecchie di `retention_executions_days` vengono
+aggregate per reminder in execution_summary e poi eliminate; outbox e logs
+vengono semplicemente cancellati oltre la loro soglia. Tutto avviene a lotti
+di `retention_batch_size` righe, ognuno in una transazione breve, con una
+pausa tra i lotti per non bloccare scheduler e web.
+"""
+
+import json
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from backend.database import get_connection
+from scheduler.log_manager import get_logger, db_log
+
+logger = get_logger("scheduler.retention")
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+EXECUTIONS_DAYS = CONFIG.get("retention_executions_days", 90)
+OUTBOX_DAYS = CONFIG.get("retention_outbox_days", 7)
+LOGS_DAYS = CONFIG.get("retention_logs_days", 30)
+BATCH_SIZE = max(int(CONFIG.get("retention_batch_size", 5000)), 1)
+PAUSE_SEC = CONFIG.get("retention_pause_sec", 0.05)
+
+
+def _cutoff(days: int, sep: str) -> str:
+    """Soglia UTC nel formato della colonna ('T' per gli scritti dallo scheduler, ' ' per CURRENT_TIMESTAMP)."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime(f"%Y-%m-%d{sep}%H:%M:%S")
+
+
+def prune_executions(days: int = EXECUTIONS_DAYS) -> int:
+    """
+    Aggrega ed elimina le executions più vecchie di `days` giorni che non
+    servono più ai solleciti: confermate, oppure di reminder eliminati/risolti.
+    """
+    cutoff = _cutoff(days, "T")
+    last_id = 0
+    total = 0
+    while True:
+        conn = get_connection()
+        try:
+            ids = [r["id"] for r in conn.execute(
+                """SELECT e.id FROM executions e
+                   JOIN reminders r ON r.id = e.reminder_id
+                   WHERE e.id > ? AND e.sent_at < ?
+                   AND (e.confirmed = 1 OR r.deleted_at IS NOT NULL
+                        OR r.status IN ('resolved', 'deleted'))
+                   ORDER BY e.id
+                   LIMIT ?""",
+                (last_id, cutoff, BATCH_SIZE),
+            )]
+            if not ids:
+                break
+            batch = json.dumps(ids)
+
+            conn.execute(
+                """INSERT INTO execution_summary
+                       (reminder_id, sent_count, confirmed_count, first_sent_at, last_sent_at, last_confirmed_at)
+                   SELECT reminder_id, COUNT(*), SUM(confirmed = 1), MIN(sent_at), MAX(sent_at), MAX(confirmed_at)
+                   FROM executions
+                   WHERE id IN (SELECT value FROM json_each(?))
+                   GROUP BY reminder_id
+                   ON CONFLICT(reminder_id) DO UPDATE SET
+                       sent_count = sent_count + excluded.sent_count,
+                       confirmed_count = confirmed_count + excluded.confirmed_count,
+                       first_sent_at = COALESCE(MIN(first_sent_at, excluded.first_sent_at), excluded.first_sent_at),
+                       last_sent_at = COALESCE(MAX(last_sent_at, excluded.last_sent_at), excluded.last_sent_at),
+                       last_confirmed_at = COALESCE(MAX(last_confirmed_at, excluded.last_confirmed_at),
+                                                    excluded.last_confirmed_at, last_confirmed_at)""",
+                (batch,),
+            )
+            # Le righe outbox referenziano l'execution (FK): vanno prima
+            conn.execute("DELETE FROM outbox WHERE execution_id IN (SELECT value FROM json_each(?))", (batch,))
+            conn.execute("DELETE FROM executions WHERE id IN (SELECT value FROM json_each(?))", (batch,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        total += len(ids)
+        last_id = ids[-1]
+        time.sleep(PAUSE_SEC)
+    return total
+
+
+def _prune_batched(table: str, where: str, params: tuple) -> int:
+    """DELETE a lotti di BATCH_SIZE righe (una transazione per lotto)."""
+    total = 0
+    while True:
+        conn = get_connection()
+        try:
+            deleted = conn.execute(
+                f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} ORDER BY id LIMIT ?)",
+                (*params, BATCH_SIZE),
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        total += deleted
+        if deleted < BATCH_SIZE:
+            return total
+        time.sleep(PAUSE_SEC)
+
+
+def prune_outbox(days: int = OUTBOX_DAYS) -> int:
+    """Elimina i messaggi outbox già chiusi (inviati, falliti, annullati) più vecchi di `days` giorni."""
+    return _prune_batched("outbox", "status != 'pending' AND created_at < ?", (_cutoff(days, " "),))
+
+
+def prune_logs(days: int = LOGS_DAYS) -> int:
+    """Elimina i log su DB più vecchi di `days` giorni."""
+    return _prune_batched("logs", "created_at < ?", (_cutoff(days, " "),))
+
+
+def run_retention():
+    """Job giornaliero: applica tutte le policy di retention e aggiorna le statistiche del planner."""
+    try:
+        start = time.monotonic()
+        outbox = prune_outbox()
+        executions = prune_executions()
+        logs = prune_logs()
+
+        conn = get_connection()
+        conn.execute("PRAGMA optimize")
+        conn.close()
+
+        elapsed = time.monotonic() - start
+        logger.info(
+            f"Retention completata in {elapsed:.1f}s: {executions} executions, "
+            f"{outbox} outbox, {logs} logs eliminati"
+        )
+        if executions or outbox or logs:
+            db_log("INFO", f"Retention: eliminati {executions} executions, {outbox} outbox, {logs} logs")
+    except Exception as e:
+        logger.error(f"Errore retention: {e}")
+        db_log("ERROR", f"Errore retention: {e}")
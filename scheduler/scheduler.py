@@ -1,4 +1,6 @@
 import sys
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -9,6 +11,12 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from scheduler.jobs import check_and_send_reminders, resend_unconfirmed_reminders, recover_stuck_reminders, _resend_on_startup
 from scheduler.backup import run_backup
+from scheduler.incremental_backup import run_incremental_backup, INTERVAL_SEC as INCREMENTAL_INTERVAL_SEC
+from scheduler.retention import run_retention
+from scheduler.due_queue import load_from_db, run_dispatcher
+from scheduler.outbox import run_outbox_worker
+from scheduler.delivery_plan import SMOOTHING_WINDOW_SEC
+from scheduler.occurrences import rebuild as rebuild_occurrences, REBUILD_SEC as OCCURRENCES_REBUILD_SEC
 from scheduler.log_manager import get_logger
 
 logger = get_logger("scheduler.main")
@@ -22,10 +30,14 @@ _scheduler: BackgroundScheduler = None
 
 def start_scheduler():
     global _scheduler
-    interval_sec = CONFIG.get("scheduler_interval_sec", 5)
+    resync_sec = CONFIG.get("scheduler_resync_sec", 300)
 
     _scheduler = BackgroundScheduler(timezone="UTC")
 
+    # Worker outbox: invia i messaggi accodati dai job rispettando i limiti Telegram
+    outbox_thread = threading.Thread(target=run_outbox_worker, daemon=True)
+    outbox_thread.start()
+
     # Recupera reminder bloccati dal riavvio precedente
     recover_stuck_reminders()
     logger.info("Recovery reminder completato")
@@ -34,15 +46,33 @@ def start_scheduler():
     _resend_on_startup()
     logger.info("Solleciti riavvio inviati")
 
-    # Job principale: ogni N secondi (minimo 10 per non sovraccaricare)
-    interval_sec = max(interval_sec, 10)
+    # Coda scadenze: il dispatcher dorme fino al prossimo reminder dovuto
+    load_from_db()
+    dispatcher_thread = threading.Thread(
+        target=run_dispatcher, args=(check_and_send_reminders, resync_sec, SMOOTHING_WINDOW_SEC), daemon=True
+    )
+    dispatcher_thread.start()
+
+    # Resync periodico della coda dal DB (modifiche esterne al processo)
+    _scheduler.add_job(
+        load_from_db,
+        trigger=IntervalTrigger(seconds=resync_sec),
+        id="resync_due_queue",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    # Occorrenze dell'agenda: rebuild completo che fa scorrere l'orizzonte
+    # (le modifiche ai reminder arrivano in modo incrementale via events.publish)
     _scheduler.add_job(
-        check_and_send_reminders,
-        trigger=IntervalTrigger(seconds=interval_sec),
-        id="check_reminders",
+        rebuild_occurrences,
+        trigger=IntervalTrigger(seconds=OCCURRENCES_REBUILD_SEC),
+        id="rebuild_occurrences",
         replace_existing=True,
         max_instances=1,
         coalesce=True,
+        next_run_time=datetime.now(timezone.utc),
     )
 
     # Job solleciti: ogni ora
@@ -55,18 +85,40 @@ def start_scheduler():
         coalesce=True,
     )
 
-    # Backup giornaliero
+    # Backup: incrementale (base + delta pagine, restore point-in-time)
+    # oppure copia completa giornaliera
+    if CONFIG.get("backup_mode", "incremental") == "incremental":
+        _scheduler.add_job(
+            run_incremental_backup,
+            trigger=IntervalTrigger(seconds=INCREMENTAL_INTERVAL_SEC),
+            id="incremental_backup",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(timezone.utc),
+        )
+    else:
+        _scheduler.add_job(
+            run_backup,
+            trigger=IntervalTrigger(hours=24),
+            id="daily_backup",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    # Retention storico (executions → execution_summary, outbox, logs)
     _scheduler.add_job(
-        run_backup,
+        run_retention,
         trigger=IntervalTrigger(hours=24),
-        id="daily_backup",
+        id="daily_retention",
         replace_existing=True,
         max_instances=1,
         coalesce=True,
     )
 
     _scheduler.start()
-    logger.info(f"Scheduler avviato (intervallo: {interval_sec}s)")
+    logger.info(f"Scheduler avviato (resync coda: {resync_sec}s)")
 
     # Blocca il thread (daemon=True garantisce la chiusura con il processo)
     import time
@@ -0,0 +1,135 @@
+"""
+Invio Telegram asincrono per lo scheduler.
+
+Un event loop dedicato (thread daemon) mantiene un unico httpx.AsyncClient
+con connessioni keep-alive verso l'API Telegram; i messaggi di un ciclo
+vengono inviati in parallelo con concorrenza limitata da un semaforo.
+Il worker outbox (scheduler/outbox.py) resta sincrono e usa send_messages().
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import httpx
+import yaml
+from scheduler.log_manager import get_logger
+
+logger = get_logger("scheduler.telegram")
+
+CONFIG_PATH = BASE_DIR / "config.yaml"
+with open(CONFIG_PATH, "r") as f:
+    CONFIG = yaml.safe_load(f)
+
+# Base URL sovrascrivibile (es. server Telegram finto in locale per i test)
+API_URL = CONFIG.get("telegram_api_url", "https://api.telegram.org")
+MAX_CONCURRENCY = max(int(CONFIG.get("telegram_max_concurrency", 8)), 1)
+TIMEOUT_SEC = CONFIG.get("telegram_timeout_sec", 10)
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_semaphore = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Avvia (una volta sola) l'event loop dedicato all'invio."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="telegram-sender", daemon=True
+            ).start()
+            _loop = loop
+    return _loop
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Client HTTP condiviso (creato nel loop dedicato al primo utilizzo)."""
+    global _client, _semaphore
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=API_URL,
+            timeout=TIMEOUT_SEC,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=MAX_CONCURRENCY,
+            ),
+        )
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _client
+
+
+def build_payload(chat_id: int, text: str, execution_id: int) -> dict:
+    """Payload sendMessage con pulsante di conferma."""
+    return {
+        "chat_id": chat_id,
+        "text": f"🔔 {text}",
+        "parse_mode": "HTML",
+        "reply_markup": json.dumps({
+            "inline_keyboard": [[
+                {"text": "✔ Confermato", "callback_data": f"confirm:{execution_id}"}
+            ]]
+        }),
+    }
+
+
+def _result(ok: bool, status=None, retry_after=None, error=None) -> dict:
+    return {"ok": ok, "status": status, "retry_after": retry_after, "error": error}
+
+
+async def _send_one(client: httpx.AsyncClient, token: str, chat_id: int, text: str, execution_id: int) -> dict:
+    async with _semaphore:
+        try:
+            r = await client.post(
+                f"/bot{token}/sendMessage", json=build_payload(chat_id, text, execution_id)
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"Errore invio Telegram a {chat_id}: {e}")
+            return _result(False, error=str(e))
+
+    if r.status_code == 200:
+        return _result(True, status=200)
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+    error = body.get("description") or f"HTTP {r.status_code}"
+    retry_after = None
+    if r.status_code == 429:
+        retry_after = (body.get("parameters") or {}).get("retry_after", 1)
+    return _result(False, status=r.status_code, retry_after=retry_after, error=error)
+
+
+async def _send_batch(token: str, messages: list) -> list:
+    client = _get_client()
+    return await asyncio.gather(
+        *(_send_one(client, token, chat_id, text, eid) for chat_id, text, eid in messages)
+    )
+
+
+def send_messages(token: str, messages: list) -> list:
+    """
+    Invia una lista di (chat_id, text, execution_id) in parallelo.
+    Bloccante per il chiamante; restituisce per ogni messaggio, nello stesso ordine,
+    un dict {ok, status, retry_after, error} (retry_after valorizzato solo sui 429).
+    """
+    if not messages:
+        return []
+    future = asyncio.run_coroutine_threadsafe(_send_batch(token, messages), _get_loop())
+    return future.result()
+
+
+def close():
+    """Chiude il client HTTP condiviso (connessioni keep-alive)."""
+    global _client
+    if _client is None or _loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(_client.aclose(), _loop).result()
+    _client = None
@@ -0,0 +1,85 @@
+"""
+Benchmark del render della lista reminder (partials/reminders_list.html).
+
+Genera righe sintetiche come quelle lette da _fetch_reminders (stati e
+ricorrenze misti, date entro ±400 giorni), poi misura _row_views() più il
+render del template, come fa GET /reminders. Stampa la mediana per ogni
+numero di righe.
+
+Uso (dalla radice del repo):
+    python scripts/bench_reminders_render.py [--rows 1000 10000] [--reps 5] [--out DIR]
+
+--out scrive l'HTML di ogni misura (render_<righe>.html) per confrontarlo
+tra due versioni del codice.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DB_PATH", str(Path(_tmp.name) / "bench.db"))
+
+from backend.routers import reminders
+
+USER_TZ = "Europe/Rome"
+STATUSES = ["pending", "sent", "completed", "paused", "resolved", "deleted"]
+
+
+def _rows(n: int, now: datetime, rng: random.Random) -> list:
+    rows = []
+    for i in range(n):
+        when = now + timedelta(minutes=rng.randint(-60 * 24 * 400, 60 * 24 * 400))
+        rec = rng.choice([None, None, "null", json.dumps(
+            {"type": rng.choice(["daily", "weekly", "monthly"]), "interval": 1})])
+        rows.append({
+            "id": i, "user_id": 1, "message": f"promemoria &amp; numero {i}",
+            "next_execution": when.strftime("%Y-%m-%dT%H:%M:%S"), "recurrence_json": rec,
+            "status": rng.choice(STATUSES), "created_at": "2026-01-01 10:00:00", "deleted_at": None,
+            "last_sent_at": "2026-01-02T10:00:00", "next_execution_epoch": int(when.timestamp()),
+            "status_rank": 1,
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark del render di reminders_list.html")
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--reps", type=int, default=5)
+    ap.add_argument("--out", help="cartella in cui scrivere l'HTML generato")
+    args = ap.parse_args(argv)
+
+    template = reminders.templates.env.get_template("partials/reminders_list.html")
+    # Ora tonda: righe identiche tra due esecuzioni nella stessa ora
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    print(f"app_env: {reminders.CONFIG.get('app_env', 'dev')}, auto_reload: {reminders.templates.env.auto_reload}")
+    for n in args.rows:
+        rows = _rows(n, now, random.Random(5))
+        times, html = [], ""
+        for _ in range(args.reps):
+            start = time.perf_counter()
+            html = template.render(
+                reminders=reminders._row_views(rows, USER_TZ), user_tz=USER_TZ, sort="status",
+                show_deleted=False, filtered=False, next_url=None,
+            )
+            times.append(time.perf_counter() - start)
+        print(f"{n} righe: mediana {statistics.median(times) * 1000:.0f} ms "
+              f"(min {min(times) * 1000:.0f}, {args.reps} ripetizioni)")
+        if args.out:
+            Path(args.out).mkdir(parents=True, exist_ok=True)
+            (Path(args.out) / f"render_{n}.html").write_text(html, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
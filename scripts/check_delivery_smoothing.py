@@ -0,0 +1,123 @@
+"""
+Regressione dello smussamento degli invii (delivery_smoothing_window_sec)
+con una ricorrenza più corta della finestra.
+
+Un reminder 'minutely' con finestra di 300 s, orologio simulato: la presa
+anticipata dell'occorrenza successiva non deve chiudere come "superata"
+l'execution precedente finché il suo messaggio è ancora pianificato
+nell'outbox (altrimenti process_batch lo annulla senza inviarlo), e
+l'anticipo non deve superare il passo della ricorrenza.
+
+Usa un DB temporaneo (DB_PATH) e non invia nulla a Telegram.
+
+Uso (dalla radice del repo):
+    python scripts/check_delivery_smoothing.py
+
+Esce con codice 1 se un controllo fallisce.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DB_PATH"] = str(Path(_tmp.name) / "smoothing.db")
+
+from backend.database import (get_connection, init_db, invalidate_config_cache, set_setting,
+                              to_epoch, to_utc_str)
+from scheduler import jobs
+
+WINDOW_SEC = 300
+START = datetime(2026, 10, 17, 9, 0, tzinfo=timezone.utc)
+
+
+class _Clock(datetime):
+    """datetime con now() guidato dal check, iniettato in scheduler.jobs."""
+
+    current = START
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def _tick(offset_sec: float):
+    _Clock.current = START + timedelta(seconds=offset_sec)
+    jobs.check_and_send_reminders()
+
+
+def _executions(conn, reminder_id: int) -> list:
+    return conn.execute(
+        """SELECT e.id, e.confirmed, o.status, o.next_attempt_at FROM executions e
+           JOIN outbox o ON o.execution_id = e.id
+           WHERE e.reminder_id = ? ORDER BY e.id""",
+        (reminder_id,),
+    ).fetchall()
+
+
+def main() -> int:
+    init_db()
+    set_setting("telegram_chat_ids", json.dumps([11]))
+    invalidate_config_cache()
+    jobs.datetime = _Clock
+    jobs.SMOOTHING_WINDOW_SEC = WINDOW_SEC
+
+    conn = get_connection()
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('check', 'x')")
+    due = START + timedelta(seconds=100)
+    reminder_id = conn.execute(
+        """INSERT INTO reminders (user_id, message, next_execution, next_execution_epoch,
+                                  recurrence_json, status)
+           VALUES (1, 'ogni minuto', ?, ?, '{"type": "minutely", "interval": 1}', 'pending')
+           RETURNING id""",
+        (to_utc_str(due), to_epoch(due)),
+    ).fetchone()[0]
+    conn.commit()
+
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(("ok   " if condition else "FAIL ") + message)
+        if not condition:
+            failures.append(message)
+
+    # t=0: scadenza a +100 s, oltre un passo (60 s) → non ancora presa
+    _tick(0)
+    check(not _executions(conn, reminder_id), "anticipo limitato al passo: nessun invio a t=0")
+
+    # t=40: prima occorrenza presa, invio pianificato alla scadenza (+100)
+    _tick(40)
+    rows = _executions(conn, reminder_id)
+    check(len(rows) == 1 and rows[0]["status"] == "pending"
+          and rows[0]["next_attempt_at"] == to_epoch(due), "prima occorrenza pianificata alla scadenza")
+
+    # t=100: presa della successiva (+160) mentre la prima è ancora in outbox
+    _tick(100)
+    rows = _executions(conn, reminder_id)
+    check(len(rows) == 2, "seconda occorrenza presa a t=100")
+    check(rows[0]["confirmed"] == 0 and rows[0]["status"] == "pending",
+          "execution precedente non superata finché il messaggio è in outbox")
+
+    # La prima esce dall'outbox; alla presa successiva viene superata, la seconda no
+    conn.execute("UPDATE outbox SET status = 'sent' WHERE execution_id = ?", (rows[0]["id"],))
+    conn.commit()
+    _tick(160)
+    rows = _executions(conn, reminder_id)
+    check(len(rows) == 3, "terza occorrenza presa a t=160")
+    check(rows[0]["confirmed"] == 1, "execution già inviata superata")
+    check(rows[1]["confirmed"] == 0 and rows[1]["status"] == "pending",
+          "execution ancora pianificata non superata")
+    conn.close()
+
+    print(f"{len(failures)} controlli falliti")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
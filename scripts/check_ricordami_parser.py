@@ -0,0 +1,130 @@
+"""
+Equivalenza e benchmark di bot/parser.py rispetto al parser precedente.
+
+Confronta parse() con le funzioni congelate in ricordami_legacy.py su:
+  - il corpus ricordami_corpus.jsonl (una stringa JSON per riga: forme
+    dell'help, orari e date non validi, anni espliciti, giorni bisestili e
+    di cambio ora, fine mese, maiuscole, messaggi vuoti o con tab/a capo);
+  - stringhe casuali composte dai token della grammatica (seed fisso);
+sotto orologi congelati diversi (fine mese/anno, 29 febbraio, cambi ora).
+Le eccezioni contano come risultato: devono coincidere anche quelle.
+
+Uso (dalla radice del repo):
+    python scripts/check_ricordami_parser.py [--fuzz N] [--reps N]
+
+Esce con codice 1 se trova differenze.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BASE_DIR = SCRIPTS_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import pytz
+import ricordami_legacy as legacy
+from bot.parser import parse
+
+CORPUS_PATH = SCRIPTS_DIR / "ricordami_corpus.jsonl"
+TZ = pytz.timezone("Europe/Rome")
+CLOCKS = [
+    (2026, 10, 17, 10, 0), (2026, 1, 31, 23, 30), (2026, 2, 28, 9, 0), (2026, 12, 31, 23, 59),
+    (2028, 2, 29, 12, 0), (2026, 3, 29, 1, 30), (2026, 10, 25, 2, 30), (2026, 6, 1, 0, 0),
+    (2026, 6, 30, 18, 0), (2027, 3, 15, 9, 0),
+]
+FUZZ_TOKENS = [
+    "ogni", "domani", "oggi", "dopodomani", "alle", "mattina", "sera", "pomeriggio", "stasera",
+    "stanotte", "stamani", "tra", "fra", "mezz'ora", "5", "31", "0", "12:30", "25:00", "minuti",
+    "ore", "giorni", "mese", "mesi", "del", "il", "anno", "marzo", "feb", "2027", "lunedì",
+    "settimana", "inizio", "fine", "di", "x", " ", "\t",
+]
+MAX_REPORTED = 10
+
+
+class _FrozenDatetime(datetime):
+    """datetime con now() fisso, iniettato nel modulo legacy."""
+
+    frozen = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.frozen
+
+
+def _old(text: str):
+    # Come il vecchio ricordami_command: "ogni …" → ricorrenza, altrimenti singolo
+    if re.match(r"ogni\b", text, re.IGNORECASE):
+        result = legacy._parse_recurrence(text)
+        return None if result is None else (result[0], result[1], result[2])
+    result = legacy._parse_reminder(text)
+    return None if result is None else (result[0], None, result[1])
+
+
+def _new(text: str, now):
+    result = parse(text, now=now)
+    if result is None:
+        return None
+    rec = json.dumps(result["recurrence"]) if result["recurrence"] else None
+    return result["when"], rec, result["message"]
+
+
+def _outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return ("eccezione", type(e).__name__)
+
+
+def _compare(texts, now) -> list:
+    _FrozenDatetime.frozen = now
+    return [(text, old, new) for text in texts
+            for old, new in [(_outcome(_old, text), _outcome(_new, text, now))] if old != new]
+
+
+def _per_parse_us(fn, texts, reps: int) -> float:
+    start = time.perf_counter()
+    for _ in range(reps):
+        for text in texts:
+            _outcome(fn, text)
+    return (time.perf_counter() - start) / (reps * len(texts)) * 1e6
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Equivalenza e benchmark del parser di /ricordami")
+    ap.add_argument("--fuzz", type=int, default=3000, help="stringhe casuali per orologio")
+    ap.add_argument("--reps", type=int, default=20, help="ripetizioni del corpus nel benchmark")
+    args = ap.parse_args(argv)
+
+    legacy.datetime = _FrozenDatetime
+    corpus = [json.loads(line) for line in CORPUS_PATH.read_text(encoding="utf-8").splitlines() if line]
+    clocks = [TZ.localize(datetime(*c)) for c in CLOCKS]
+    rng = random.Random(7)
+
+    diffs, cases, fuzzed = [], 0, 0
+    for now in clocks:
+        fuzz = [" ".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 7))) for _ in range(args.fuzz)]
+        diffs += [(now, *d) for d in _compare(corpus, now)]
+        diffs += [(now, *d) for d in _compare(fuzz, now)]
+        cases += len(corpus)
+        fuzzed += len(fuzz)
+    for now, text, old, new in diffs[:MAX_REPORTED]:
+        print(f"DIFF {now:%Y-%m-%d %H:%M} {text!r}\n  vecchio: {old}\n  nuovo:   {new}")
+    print(f"corpus: {cases} casi, fuzz: {fuzzed} stringhe, {len(clocks)} orologi → {len(diffs)} differenze")
+
+    _FrozenDatetime.frozen = clocks[0]
+    old_us = _per_parse_us(_old, corpus, args.reps)
+    new_us = _per_parse_us(lambda text: _new(text, None), corpus, args.reps)
+    print(f"benchmark ({args.reps} × {len(corpus)} parse): vecchio {old_us:.1f} µs/parse, nuovo {new_us:.1f} µs/parse")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())